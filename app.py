@@ -1,12 +1,14 @@
 #!/usr/bin/env python
 
-from glob import glob
 import json
 
-from flask import Flask, make_response, render_template
+from flask import Flask, abort, make_response, render_template
 from werkzeug.debug import DebuggedApplication
 
 import app_config
+import catalog
+import corpus as corpus_store
+import count_cache
 from render_utils import make_context, smarty_filter, urlencode_filter
 import static
 
@@ -20,18 +22,29 @@ app.add_template_filter(urlencode_filter, name='urlencode')
 @app.route('/')
 def index():
     """
-    Example view demonstrating rendering a simple HTML page.
+    The first page of briefings, newest first.
     """
-    context = make_context()
+    return _index_page(1)
+
+@app.route('/page/<int:number>/')
+def _index_page(number):
+    """
+    A page of briefings from the catalog. See "fab data.build_catalog".
+    """
+    briefings = catalog.load()
+
+    if number < 1 or number > briefings.page_count():
+        abort(404)
 
-    with open('data/featured.json') as f:
-        context['featured'] = json.load(f)
+    context = make_context()
 
-    context['links'] = []
+    context['featured'] = count_cache.load_json('data/featured.json')
+    context['briefings'] = briefings.page(number)
+    context['page'] = number
+    context['page_count'] = briefings.page_count()
 
-    for file in glob('data/text/*.txt'):
-        filename = file.split('/')[2].split('.')[0]
-        context['links'].append(filename)
+    # Pages are rendered to flat files, so links must be relative
+    context['root'] = '' if number == 1 else '../../'
 
     return make_response(render_template('index.html', **context))
 
@@ -43,8 +56,9 @@ def _briefing(slug):
 
     context['date'] = date
 
-    with open('data/text/counts/%s.json' % date) as f:
-        context['briefing'] = json.load(f)
+    # Only the most frequent n-grams, precomputed by "fab data.analyze_transcripts"
+    context['briefing'] = count_cache.load_json('data/text/top/%s.json' % slug)
+    context['order_names'] = ['Words', 'Two-word phrases', 'Three-word phrases']
 
     context['slug'] = slug
 
@@ -54,38 +68,33 @@ def _briefing(slug):
 def _word(slug):
     context = make_context()
 
-    data = {}
+    corpus = corpus_store.load()
+    counts = corpus.term_counts(slug)
 
-    for file in glob('data/text/counts/*.json'):
-        with open(file) as f:
-            transcript_data = json.load(f)
+    rows = []
 
-            date = file.split('/')[3].split('.')[0]
-            data[date] = {}
+    # One row per briefing, since several can share a date
+    for briefing_slug, totals in corpus.briefing_totals().items():
+        row = dict(totals)
+        row.update(counts.get(briefing_slug, { 'count': 0, 'secretary': 0, 'reporter': 0 }))
+        row['slug'] = briefing_slug
 
-            reporter_words = transcript_data['reporters']['words']
-            reporter_count = transcript_data['reporters']['count']
-            secretary_words = transcript_data['secretary']['words']
-            secretary_count = transcript_data['secretary']['count']
+        rows.append(row)
 
-            data[date]['reporter_count'] = reporter_count
-            data[date]['secretary_count'] = secretary_count
+    context['rows'] = sorted(rows, key=lambda row: (row['date'], row['slug']))
 
-            for word in reporter_words:
-                for k, v in word.iteritems():
-                    if k == slug:
-                        data[date]['reporter'] = v
-                        break
-
-            for word in secretary_words:
-                for k, v in word.iteritems():
-                    if k == slug:
-                        data[date]['secretary'] = v
-                        break
+    return make_response(render_template('word.html', **context))
 
-    context['data'] = data
+@app.route('/debug/cache.json')
+def _cache_stats():
+    """
+    Hit and miss counts for the in-process caches.
+    """
+    stats = {
+        'json': count_cache.json_files.stats()
+    }
 
-    return make_response(render_template('word.html', **context))
+    return make_response(json.dumps(stats), 200, { 'Content-Type': 'application/json' })
 
 @app.route('/comments/')
 def comments():
@@ -51,6 +51,9 @@ ASSETS_S3_BUCKET = {
 DEFAULT_MAX_AGE = 20 
 ASSETS_MAX_AGE = 86400
 
+# Compiled JS/CSS are named after their content, so they never go stale
+HASHED_ASSETS_MAX_AGE = 31536000
+
 PRODUCTION_SERVERS = ['cron.nprapps.org']
 STAGING_SERVERS = ['50.112.92.131']
 
@@ -0,0 +1,120 @@
+#!/usr/bin/env python
+
+"""
+Catalog of every briefing, built by the analysis pipeline.
+
+The catalog is a single JSON file listing each briefing's slug, date,
+title, source URL, token count and speaker stats, newest first, so views
+can list briefings without touching the transcripts.
+"""
+
+from datetime import datetime
+import json
+import os
+
+import speakers
+
+CATALOG_PATH = 'data/text/catalog.json'
+PER_PAGE = 50
+
+def _slug_from_path(path):
+    filename = os.path.split(path)[1]
+
+    return os.path.splitext(filename)[0]
+
+def _briefing_stats(count_path):
+    """
+    Summarize a count file without decoding its n-grams.
+    """
+    with open(count_path, 'r') as f:
+        data = json.load(f)
+
+    stats = {
+        'count': data['count'],
+        'speakers': len(data.get('speakers', [])),
+        'turns': len(data.get('turns', [])) / 2
+    }
+
+    for role in speakers.ROLES:
+        stats['%s_count' % role] = data.get(role, {}).get('count', 0)
+
+    return stats
+
+def build_catalog(paths, count_path, sources={}, catalog_path=CATALOG_PATH):
+    """
+    Build the catalog from transcript paths.
+
+    `count_path` maps a transcript path to its count file and `sources`
+    maps slugs to their row in the links CSV (title and transcript URL).
+    Transcripts that haven't been counted yet are left out.
+    """
+    briefings = []
+
+    for path in paths:
+        if not os.path.exists(count_path(path)):
+            continue
+
+        slug = _slug_from_path(path)
+        date = datetime.strptime('-'.join(slug.split('-')[:3]), '%m-%d-%y')
+        source = sources.get(slug, {})
+
+        briefing = {
+            'slug': slug,
+            'date': date.strftime('%Y-%m-%d'),
+            'title': source.get('title'),
+            'url': source.get('transcript_url')
+        }
+
+        briefing.update(_briefing_stats(count_path(path)))
+        briefings.append(briefing)
+
+    briefings.sort(key=lambda briefing: (briefing['date'], briefing['slug']), reverse=True)
+
+    with open('%s.tmp' % catalog_path, 'w') as f:
+        json.dump(briefings, f, indent=4, sort_keys=True)
+
+    os.rename('%s.tmp' % catalog_path, catalog_path)
+
+    return len(briefings)
+
+def _mtime(path):
+    return os.path.getmtime(path) if os.path.exists(path) else None
+
+class Catalog(object):
+    """
+    The loaded catalog. Empty if it hasn't been built yet.
+    """
+    def __init__(self, catalog_path=CATALOG_PATH):
+        self.catalog_path = catalog_path
+        self.mtime = _mtime(catalog_path)
+        self.briefings = []
+
+        if self.mtime is not None:
+            with open(catalog_path, 'r') as f:
+                self.briefings = json.load(f)
+
+        self.by_slug = dict((briefing['slug'], briefing) for briefing in self.briefings)
+
+    def page_count(self, per_page=PER_PAGE):
+        return max((len(self.briefings) + per_page - 1) / per_page, 1)
+
+    def page(self, number, per_page=PER_PAGE):
+        """
+        Get one page of briefings, newest first. Pages start at 1.
+        """
+        start = (number - 1) * per_page
+
+        return self.briefings[start:start + per_page]
+
+_catalog = None
+
+def load(catalog_path=CATALOG_PATH):
+    """
+    Get the shared catalog, reloading it if it has been rebuilt since it was loaded.
+    """
+    global _catalog
+
+    if _catalog is None or _catalog.catalog_path != catalog_path or _catalog.mtime != _mtime(catalog_path):
+        _catalog = Catalog(catalog_path)
+
+    return _catalog
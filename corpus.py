@@ -0,0 +1,313 @@
+#!/usr/bin/env python
+
+"""
+SQLite store for the briefing corpus, shared by the fab tasks and views.
+
+Each briefing's transcript, speaker table, turns and n-gram counts (overall
+and for the secretary and reporters) are stored in one database. Weekly
+counts are aggregated into their own table, so a term over time is a single
+indexed query.
+
+This is the ad-hoc query API, for views and one-off lookups of any term.
+The batch trend exports in fabfile/data.py read from the term matrix
+instead, which analyze_words rebuilds from the count files.
+"""
+
+import os
+import sqlite3
+import threading
+
+import ngrams
+
+CORPUS_PATH = 'data/corpus.db'
+
+SCHEMA = [
+    '''CREATE TABLE IF NOT EXISTS briefings (
+        id INTEGER PRIMARY KEY,
+        slug TEXT NOT NULL UNIQUE,
+        date TEXT NOT NULL,
+        week TEXT NOT NULL,
+        title TEXT,
+        url TEXT,
+        token_count INTEGER NOT NULL,
+        secretary_count INTEGER NOT NULL,
+        reporters_count INTEGER NOT NULL,
+        guests_count INTEGER NOT NULL
+    )''',
+    'CREATE INDEX IF NOT EXISTS briefings_date ON briefings (date)',
+    '''CREATE TABLE IF NOT EXISTS transcripts (
+        briefing_id INTEGER PRIMARY KEY REFERENCES briefings (id),
+        text TEXT NOT NULL
+    )''',
+    '''CREATE TABLE IF NOT EXISTS speakers (
+        briefing_id INTEGER NOT NULL REFERENCES briefings (id),
+        speaker_id INTEGER NOT NULL,
+        name TEXT,
+        role TEXT,
+        PRIMARY KEY (briefing_id, speaker_id)
+    )''',
+    '''CREATE TABLE IF NOT EXISTS turns (
+        briefing_id INTEGER NOT NULL REFERENCES briefings (id),
+        position INTEGER NOT NULL,
+        token_offset INTEGER NOT NULL,
+        speaker_id INTEGER NOT NULL,
+        PRIMARY KEY (briefing_id, position)
+    )''',
+    '''CREATE TABLE IF NOT EXISTS terms (
+        id INTEGER PRIMARY KEY,
+        term TEXT NOT NULL UNIQUE
+    )''',
+    '''CREATE TABLE IF NOT EXISTS counts (
+        term_id INTEGER NOT NULL REFERENCES terms (id),
+        briefing_id INTEGER NOT NULL REFERENCES briefings (id),
+        count INTEGER NOT NULL,
+        secretary INTEGER NOT NULL,
+        reporters INTEGER NOT NULL,
+        PRIMARY KEY (term_id, briefing_id)
+    )''',
+    'CREATE INDEX IF NOT EXISTS counts_briefing ON counts (briefing_id)',
+    '''CREATE TABLE IF NOT EXISTS weekly_counts (
+        term_id INTEGER NOT NULL REFERENCES terms (id),
+        week TEXT NOT NULL,
+        count INTEGER NOT NULL,
+        PRIMARY KEY (term_id, week)
+    )''',
+    # Weeks whose briefings have changed since weekly_counts was updated
+    '''CREATE TABLE IF NOT EXISTS stale_weeks (
+        week TEXT PRIMARY KEY
+    )''',
+    'CREATE INDEX IF NOT EXISTS briefings_week ON briefings (week)'
+]
+
+# Tables keyed by briefing, cleared when a briefing is replaced
+BRIEFING_TABLES = [
+    ('transcripts', 'briefing_id'),
+    ('speakers', 'briefing_id'),
+    ('turns', 'briefing_id'),
+    ('counts', 'briefing_id'),
+    ('briefings', 'id')
+]
+
+class Corpus(object):
+    """
+    A connection to the corpus database.
+    """
+    def __init__(self, path=CORPUS_PATH):
+        self.path = path
+        self.db = sqlite3.connect(path)
+
+        self.db.execute('PRAGMA foreign_keys = ON')
+
+        for statement in SCHEMA:
+            self.db.execute(statement)
+
+        self.db.commit()
+
+    def close(self):
+        self.db.close()
+
+    def _term_ids(self, terms):
+        """
+        Get ids for `terms`, adding any the corpus hasn't seen.
+        """
+        self.db.executemany('INSERT OR IGNORE INTO terms (term) VALUES (?)', ((term,) for term in terms))
+
+        ids = {}
+        terms = list(terms)
+
+        # Stay under SQLite's limit on query parameters
+        for i in range(0, len(terms), 500):
+            chunk = terms[i:i + 500]
+            rows = self.db.execute('SELECT term, id FROM terms WHERE term IN (%s)' % ','.join('?' * len(chunk)), chunk)
+            ids.update(rows)
+
+        return ids
+
+    def _delete_briefing(self, slug):
+        row = self.db.execute('SELECT id, week FROM briefings WHERE slug = ?', (slug,)).fetchone()
+
+        if not row:
+            return False
+
+        briefing_id, week = row
+
+        for table, column in BRIEFING_TABLES:
+            self.db.execute('DELETE FROM %s WHERE %s = ?' % (table, column), (briefing_id,))
+
+        self._mark_stale(week)
+
+        return True
+
+    def _mark_stale(self, week):
+        self.db.execute('INSERT OR IGNORE INTO stale_weeks (week) VALUES (?)', (week,))
+
+    def store_briefing(self, slug, date, text, counts, title=None, url=None):
+        """
+        Add or replace a briefing.
+
+        `date` is YYYY-MM-DD and `counts` is the contents of its count file
+        (see `speakers.count_speakers`).
+        """
+        counts = ngrams.read_counts(counts)
+
+        self._delete_briefing(slug)
+
+        cursor = self.db.execute(
+            '''INSERT INTO briefings
+                (slug, date, week, title, url, token_count, secretary_count, reporters_count, guests_count)
+                VALUES (?, ?, date(?, '-' || strftime('%w', ?) || ' days'), ?, ?, ?, ?, ?, ?)''',
+            (
+                slug, date, date, date, title, url, counts['count'],
+                counts.get('secretary', {}).get('count', 0),
+                counts.get('reporters', {}).get('count', 0),
+                counts.get('guests', {}).get('count', 0)
+            )
+        )
+
+        briefing_id = cursor.lastrowid
+
+        self._mark_stale(self.db.execute('SELECT week FROM briefings WHERE id = ?', (briefing_id,)).fetchone()[0])
+
+        self.db.execute('INSERT INTO transcripts (briefing_id, text) VALUES (?, ?)', (briefing_id, text))
+
+        self.db.executemany(
+            'INSERT INTO speakers (briefing_id, speaker_id, name, role) VALUES (?, ?, ?, ?)',
+            ((briefing_id, i, name, role) for i, (name, role) in enumerate(counts.get('speakers', [])))
+        )
+
+        turns = counts.get('turns', [])
+
+        self.db.executemany(
+            'INSERT INTO turns (briefing_id, position, token_offset, speaker_id) VALUES (?, ?, ?, ?)',
+            ((briefing_id, i / 2, turns[i], turns[i + 1]) for i in range(0, len(turns), 2))
+        )
+
+        words = counts['words']
+        secretary = counts.get('secretary', {}).get('words', {})
+        reporters = counts.get('reporters', {}).get('words', {})
+
+        term_ids = self._term_ids(words.keys())
+
+        self.db.executemany(
+            'INSERT INTO counts (term_id, briefing_id, count, secretary, reporters) VALUES (?, ?, ?, ?, ?)',
+            (
+                (term_ids[word], briefing_id, count, secretary.get(word, 0), reporters.get(word, 0))
+                for word, count in words.iteritems()
+            )
+        )
+
+        self.db.commit()
+
+        return briefing_id
+
+    def remove_briefing(self, slug):
+        removed = self._delete_briefing(slug)
+        self.db.commit()
+
+        return removed
+
+    def slugs(self):
+        return [row[0] for row in self.db.execute('SELECT slug FROM briefings')]
+
+    def briefing_count(self):
+        return self.db.execute('SELECT COUNT(*) FROM briefings').fetchone()[0]
+
+    def update_weeks(self):
+        """
+        Recompute the weekly aggregates for weeks whose briefings have been
+        stored or removed since the last update. Returns the number of weeks.
+        """
+        weeks = [row[0] for row in self.db.execute('SELECT week FROM stale_weeks')]
+
+        for week in weeks:
+            self.db.execute('DELETE FROM weekly_counts WHERE week = ?', (week,))
+            self.db.execute(
+                '''INSERT INTO weekly_counts (term_id, week, count)
+                    SELECT counts.term_id, briefings.week, SUM(counts.count)
+                    FROM briefings JOIN counts ON counts.briefing_id = briefings.id
+                    WHERE briefings.week = ?
+                    GROUP BY counts.term_id''',
+                (week,)
+            )
+            self.db.execute('DELETE FROM stale_weeks WHERE week = ?', (week,))
+
+        self.db.commit()
+
+        return len(weeks)
+
+    def briefing_totals(self):
+        """
+        Date and secretary and reporter token counts for every briefing,
+        keyed by slug.
+        """
+        rows = self.db.execute('SELECT slug, date, secretary_count, reporters_count FROM briefings')
+
+        return dict(
+            (slug, { 'date': date, 'secretary_count': secretary, 'reporter_count': reporters })
+            for slug, date, secretary, reporters in rows
+        )
+
+    def term_counts(self, term):
+        """
+        Get counts for a term, keyed by briefing slug.
+
+        Briefings that never use the term are omitted.
+        """
+        rows = self.db.execute(
+            '''SELECT briefings.slug, briefings.date, counts.count, counts.secretary, counts.reporters
+                FROM terms
+                JOIN counts ON counts.term_id = terms.id
+                JOIN briefings ON briefings.id = counts.briefing_id
+                WHERE terms.term = ?''',
+            (term,)
+        )
+
+        output = {}
+
+        for slug, date, count, secretary, reporters in rows:
+            output[slug] = {
+                'date': date,
+                'count': count,
+                'secretary': secretary,
+                'reporter': reporters
+            }
+
+        return output
+
+    def week_counts(self, terms, start=None, end=None):
+        """
+        Sum weekly counts for `terms` (e.g. a set of synonyms), keyed by week.
+
+        `start` and `end` are YYYY-MM-DD strings bounding the weeks returned
+        (end is exclusive). Weeks with no uses are omitted.
+        """
+        terms = list(terms)
+
+        # IN () is a syntax error in SQLite
+        if not terms:
+            return {}
+
+        rows = self.db.execute(
+            '''SELECT weekly_counts.week, SUM(weekly_counts.count)
+                FROM terms JOIN weekly_counts ON weekly_counts.term_id = terms.id
+                WHERE terms.term IN (%s) AND weekly_counts.week >= ? AND weekly_counts.week < ?
+                GROUP BY weekly_counts.week''' % ','.join('?' * len(terms)),
+            terms + [start or '', end or '9999']
+        )
+
+        return dict(rows)
+
+_local = threading.local()
+
+def load(path=CORPUS_PATH):
+    """
+    Get a corpus connection for the current thread. SQLite connections
+    can't be shared between threads.
+    """
+    corpora = _local.__dict__.setdefault('corpora', {})
+    path = os.path.abspath(path)
+
+    if path not in corpora:
+        corpora[path] = Corpus(path)
+
+    return corpora[path]
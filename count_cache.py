@@ -0,0 +1,84 @@
+#!/usr/bin/env python
+
+"""
+In-process LRU cache for parsed JSON data files, such as the per-briefing
+top n-gram tables.
+
+Entries are keyed by path and checked against the file's mtime on every
+read, so a rebuilt file is picked up without restarting the app.
+"""
+
+from collections import OrderedDict
+import json
+import os
+import threading
+
+MAX_ENTRIES = 64
+
+class LRUCache(object):
+    """
+    A size-bounded cache of parsed files, evicting the least recently used.
+    """
+    def __init__(self, loader, max_entries=MAX_ENTRIES):
+        self.loader = loader
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, path):
+        """
+        Get the parsed contents of `path`, loading it if it isn't cached or
+        has changed on disk.
+        """
+        mtime = os.path.getmtime(path)
+
+        with self._lock:
+            entry = self._entries.pop(path, None)
+
+            if entry and entry[0] == mtime:
+                self.hits += 1
+                self._entries[path] = entry
+
+                return entry[1]
+
+            self.misses += 1
+
+        value = self.loader(path)
+
+        with self._lock:
+            self._entries[path] = (mtime, value)
+
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        return {
+            'entries': len(self._entries),
+            'max_entries': self.max_entries,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions
+        }
+
+def _load_json(path):
+    with open(path, 'r') as f:
+        return json.load(f)
+
+json_files = LRUCache(_load_json)
+
+def load_json(path):
+    """
+    Get a parsed JSON file from the shared cache. Don't modify the result.
+    """
+    return json_files.get(path)
@@ -5,6 +5,7 @@ from fabric.state import env
 from termcolor import colored
 
 import app_config
+import render_utils
 
 # Other fabfiles
 import assets
@@ -126,9 +127,13 @@ def update():
     data.update()
 
 @task
-def deploy(remote='origin'):
+def deploy(remote='origin', verify=False):
     """
     Deploy the latest app to S3 and, if configured, to our servers.
+
+    Files unchanged since the last deploy from this machine are skipped
+    without checking S3. Pass verify=True to compare every file against the
+    bucket instead.
     """
     require('settings', provided_by=[production, staging])
 
@@ -158,23 +163,29 @@ def deploy(remote='origin'):
     # Clear files that should never be deployed
     local('rm -rf www/live-data')
 
+    hashed_assets = render_utils.read_asset_manifest().values()
+
     flat.deploy_folder(
         'www',
         app_config.PROJECT_SLUG,
         max_age=app_config.DEFAULT_MAX_AGE,
-        ignore=['www/assets/*']
+        ignore=['www/assets/*'],
+        verify=verify,
+        max_ages=dict(('www/%s' % path, app_config.HASHED_ASSETS_MAX_AGE) for path in hashed_assets)
     )
 
     flat.deploy_folder(
         '.briefings_html',
         app_config.PROJECT_SLUG,
         max_age=app_config.DEFAULT_MAX_AGE,
+        verify=verify
     )
 
     flat.deploy_folder(
         'www/assets',
         '%s/assets' % app_config.PROJECT_SLUG,
-        max_age=app_config.ASSETS_MAX_AGE
+        max_age=app_config.ASSETS_MAX_AGE,
+        verify=verify
     )
 
 
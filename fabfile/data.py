@@ -4,26 +4,39 @@
 Commands that update or process the application data.
 """
 import codecs
+from cStringIO import StringIO
 from collections import defaultdict
-import csv
 from datetime import datetime, date, timedelta
 from glob import glob
+import hashlib
+from itertools import imap, izip
 import json
+from multiprocessing import Pool, Process, Queue, cpu_count
 import os
-from time import sleep
+import resource
+import string
+from time import sleep, time
+import traceback
 
 from apiclient.discovery import build
 from fabric.api import task
 from facebook import GraphAPI
+from lxml import etree
 from lxml.html import fromstring
 import nltk
-from scrapelib import Scraper, FileCache
 from slugify import slugify
+from termcolor import colored
 from twitter import Twitter, OAuth
 import unicodecsv
 
 import app_config
+import catalog
 import copytext
+import corpus
+from fetcher import Fetcher
+import ngrams
+import speakers
+import term_matrix
 
 SEARCH_TERMS = sorted([
     'isis',
@@ -75,10 +88,25 @@ SYNONYMS = [
 
 ROOT_URL = 'http://www.whitehouse.gov/briefing-room/press-briefings'
 CSV_PATH = 'briefing_links.csv'
+LINK_FIELDS = ['date', 'title', 'transcript_url']
+LISTING_PAGES = 22
+SCRAPE_STATE_PATH = 'data/scrape_state.json'
 
-s = Scraper(requests_per_minute=60)
-s.cache_storage = FileCache('press_briefing_cache')
-s.cache_write_only = False
+# Count n-grams up to this order, dropping longer n-grams seen fewer than
+# NGRAM_MIN_COUNT times (2 prunes hapaxes)
+NGRAM_ORDER = 3
+NGRAM_MIN_COUNT = 1
+
+# Keep this many of the most frequent n-grams of each order per briefing,
+# optionally leaving out stopwords and punctuation
+TOP_N = 100
+FILTER_STOPWORDS = True
+
+# Bump when the analysis output changes, so analyze_transcripts redoes everything
+ANALYZER_VERSION = 6
+ANALYSIS_MANIFEST_PATH = 'data/text/analysis_manifest.json'
+
+fetcher = Fetcher(workers=8, requests_per_minute=60, cache_dir='press_briefing_cache')
 
 @task(default=True)
 def update():
@@ -88,137 +116,605 @@ def update():
     #update_featured_social()
 
 @task
-def scrape_briefings():
-    for index in range(0, 22):
-        list = '%s?page=%i' % (ROOT_URL, index)
-        print 'parsing %s' % list
-        write_corpus(list)
+def scrape_briefings(workers=8, full=False):
+    """
+    Scrape briefing links and transcripts, fetching `workers` pages at a time.
+
+    By default paging stops at the briefings seen by the last successful run
+    and only new transcripts are fetched. Pass full=True to walk every
+    listing page and re-parse every transcript.
+    """
+    fetcher.workers = int(workers)
+    full = str(full).lower() in ('true', '1', 'yes')
+
+    links = read_links()
+
+    if full:
+        links = _dedupe_links(scrape_links() + links)
+        new_links = links
+    else:
+        known_urls = set(row['transcript_url'] for row in links)
+        new_links = [row for row in scrape_links(read_scrape_state(), known_urls) if row['transcript_url'] not in known_urls]
+        links = _dedupe_links(new_links + links)
+
+    print 'Parsing %i briefings' % len(new_links)
+
+    fetch_transcripts(new_links)
+
+    # Only record links once their transcripts are safely on disk
+    write_links(links)
+
+    if links:
+        write_scrape_state(links[0])
+
+def scrape_links(mark=None, known_urls=()):
+    """
+    Page through the briefing listing, newest first, and return briefing links.
+
+    Paging stops after the first page that reaches a known link or anything
+    older than `mark`, the newest link from the last run. The first page is
+    fetched on its own, since an incremental run rarely needs more.
+    """
+    rows = []
+    batches = [range(0, 1)] + [
+        range(start, min(start + fetcher.workers, LISTING_PAGES)) for start in range(1, LISTING_PAGES, fetcher.workers)
+    ]
+
+    for batch in batches:
+        pages = ['%s?page=%i' % (ROOT_URL, index) for index in batch]
+
+        # Listing pages change, so never serve them from the cache
+        for page, response in izip(pages, fetcher.fetch_all(pages, refresh=True)):
+            print 'parsing %s' % page
+
+            entries = parse_listing(response)
+            rows.extend([row for row in entries if row['title'].startswith('Press Briefing')])
+
+            if any(_reached_mark(row, mark, known_urls) for row in entries):
+                return rows
+
+    return rows
+
+def _reached_mark(row, mark, known_urls):
+    """
+    Has paging reached links seen in a previous run?
+    """
+    if row['transcript_url'] in known_urls:
+        return True
+
+    if not mark:
+        return False
+
+    if row['transcript_url'] == mark['transcript_url']:
+        return True
 
-    read_csv()
+    return _parse_date(row['date']) < _parse_date(mark['date'])
 
-def write_corpus(page):
-    response = s.urlopen(page)
+def _parse_date(date):
+    return datetime.strptime(date, '%B %d, %Y')
+
+def parse_listing(response):
+    """
+    Parse every entry on a listing page into a link row.
+    """
     doc = fromstring(response)
     list = doc.find_class('entry-list')[0]
-    writer = unicodecsv.writer(open('data/%s' % CSV_PATH, 'a'))
-    writer.writerow(['date', 'title', 'transcript_url'])
+
+    rows = []
+
     for item in list.findall('li'):
-        write_row(item, writer)
-
-def write_row(row, writer):
-    date = row.find_class('date-line')[0]
-    title = row.findall('h3')[0].findall('a')[0]
-    href = title.attrib['href']
-
-    if title.text_content().startswith("Press Briefing"):
-        writer.writerow([date.text_content(), title.text_content(), href])
-
-def read_csv():
-    with open('data/%s' % CSV_PATH, 'rb') as f:
-        reader = csv.DictReader(f, fieldnames=['date', 'title', 'transcript_url'])
-        for row in reader:
-            print row
-            parse_transcript(row)
-
-def parse_transcript(row):
-    if row['date'] != 'date':
-        date = datetime.strptime(row['date'], '%B %d, %Y')
-        slug_date = datetime.strftime(date, '%m-%d-%y')
-        slug = slugify('%s-%s' % (slug_date.decode('utf-8').strip(), row['title'].decode('utf-8').strip()))
-
-    if row['transcript_url'] != 'transcript_url':
-        response = s.urlopen('http://whitehouse.gov%s' % row['transcript_url'])
-        doc = fromstring(response)
-        transcript = doc.get_element_by_id('content')
-        paragraphs = transcript.findall('p')
-
-        # for two random days in december the white house decided
-        # to put everything in divs
-        # i hate everything
-        if not paragraphs:
-            paragraphs = transcript.findall('div')
-
-        text = ''
-        for graph in paragraphs:
-            text += '\n%s' % graph.text_content().strip()
-
-        f = codecs.open('data/text/%s.txt' % slug, 'w', encoding='utf-8')
-        f.write(text)
-        f.close()
+        date = item.find_class('date-line')[0]
+        title = item.findall('h3')[0].findall('a')[0]
+
+        rows.append({
+            'date': date.text_content().strip(),
+            'title': title.text_content().strip(),
+            'transcript_url': title.attrib['href']
+        })
+
+    return rows
+
+def _dedupe_links(rows):
+    """
+    Drop repeated links, keeping the first (newest) of each.
+    """
+    seen = set()
+    output = []
+
+    for row in rows:
+        if row['transcript_url'] in seen:
+            continue
+
+        seen.add(row['transcript_url'])
+        output.append(row)
+
+    return output
+
+def read_links():
+    """
+    Read briefing links from the CSV, skipping stray header rows.
+    """
+    path = 'data/%s' % CSV_PATH
+
+    if not os.path.exists(path):
+        return []
+
+    with open(path, 'rb') as f:
+        reader = unicodecsv.DictReader(f, fieldnames=LINK_FIELDS)
+
+        return [row for row in reader if row['transcript_url'] != 'transcript_url']
+
+def write_links(rows):
+    """
+    Rewrite the links CSV with a single header row.
+    """
+    path = 'data/%s' % CSV_PATH
+
+    with open('%s.tmp' % path, 'wb') as f:
+        writer = unicodecsv.DictWriter(f, LINK_FIELDS)
+        writer.writerow(dict(zip(LINK_FIELDS, LINK_FIELDS)))
+        writer.writerows(rows)
+
+    os.rename('%s.tmp' % path, path)
+
+def read_scrape_state():
+    """
+    Get the newest link seen by the last successful scrape.
+    """
+    if not os.path.exists(SCRAPE_STATE_PATH):
+        return None
+
+    with open(SCRAPE_STATE_PATH, 'r') as f:
+        return json.load(f)
+
+def write_scrape_state(row):
+    with open(SCRAPE_STATE_PATH, 'w') as f:
+        json.dump({ 'date': row['date'], 'transcript_url': row['transcript_url'] }, f)
+
+def fetch_transcripts(rows):
+    """
+    Fetch and parse the transcript for each link row.
+    """
+    urls = ['http://whitehouse.gov%s' % row['transcript_url'] for row in rows]
+
+    for row, response in izip(rows, fetcher.fetch_all(urls)):
+        print row
+        parse_transcript(row, response)
+
+def _briefing_slug(row):
+    date = datetime.strptime(row['date'], '%B %d, %Y')
+    slug_date = datetime.strftime(date, '%m-%d-%y')
+
+    return slugify('%s-%s' % (slug_date.decode('utf-8').strip(), row['title'].strip()))
+
+def parse_transcript(row, response):
+    slug = _briefing_slug(row)
+
+    with codecs.open('data/text/%s.txt' % slug, 'w', encoding='utf-8') as f:
+        for text in iter_paragraphs(response):
+            f.write('\n%s' % text)
+
+def iter_paragraphs(response):
+    """
+    Stream the text of each top-level paragraph in a transcript's #content.
+
+    Elements are discarded as soon as they have been read, so the parsed
+    tree never holds more than one paragraph.
+    """
+    if isinstance(response, unicode):
+        response = response.encode('utf-8')
+
+    # Element depth inside #content, None until we reach it
+    depth = None
+    found_paragraphs = False
+    divs = []
+
+    for event, el in etree.iterparse(StringIO(response), events=('start', 'end'), html=True, encoding='utf-8'):
+        if depth is None:
+            if event == 'start' and el.get('id') == 'content':
+                depth = 0
+            elif event == 'end':
+                el.clear()
+
+            continue
+
+        if event == 'start':
+            depth += 1
+            continue
+
+        # End of #content
+        if depth == 0:
+            break
+
+        if depth == 1:
+            text = etree.tostring(el, method='text', encoding=unicode, with_tail=False).strip()
+
+            if el.tag == 'p':
+                found_paragraphs = True
+                divs = []
+
+                yield text
+            elif el.tag == 'div' and not found_paragraphs:
+                divs.append(text)
+
+            el.clear()
+
+            while el.getprevious() is not None:
+                del el.getparent()[0]
+
+        depth -= 1
+
+    # for two random days in december the white house decided
+    # to put everything in divs
+    # i hate everything
+    if not found_paragraphs:
+        for text in divs:
+            yield text
 
 @task
-def analyze_transcripts():
-    for path in glob('data/text/*.txt'):
+def analyze_transcripts(jobs=None, force=False):
+    """
+    Count words in new or changed transcripts, using `jobs` processes (default: one per core).
+
+    Transcripts whose text and analyzer settings match the manifest from the
+    last run are skipped; pass force=True to recount everything. A transcript
+    that fails is reported at the end instead of stopping the run.
+    """
+    jobs = int(jobs) if jobs else cpu_count()
+    force = str(force).lower() in ('true', '1', 'yes')
+
+    manifest = _read_analysis_manifest()
+    version = _analyzer_version()
+
+    paths = sorted(glob('data/text/*.txt'))
+    hashes = dict((path, _hash_file(path)) for path in paths)
+
+    changed = [
+        path for path in paths
+        if force
+        or path not in manifest
+        or manifest[path] != { 'hash': hashes[path], 'version': version }
+        or not os.path.exists(_count_path(path))
+        or not os.path.exists(_top_path(path))
+    ]
+
+    for output_dir in ['data/text/counts', 'data/text/top']:
+        if not os.path.exists(output_dir):
+            os.makedirs(output_dir)
+
+    removed = _remove_stale_counts(manifest, paths)
+
+    print 'Analyzing %i of %i transcripts' % (len(changed), len(paths))
+
+    if jobs > 1 and len(changed) > 1:
+        pool = Pool(jobs)
+        results = pool.imap(_analyze_transcript, changed)
+    else:
+        pool = None
+        results = imap(_analyze_transcript, changed)
+
+    failures = []
+
+    # imap yields in input order, so output is the same for any number of jobs
+    for path, error in results:
+        print path
+
+        if error:
+            failures.append((path, error))
+            manifest.pop(path, None)
+        else:
+            manifest[path] = { 'hash': hashes[path], 'version': version }
+
+    if pool:
+        pool.close()
+        pool.join()
+
+    for path, error in failures:
+        print colored('Failed to analyze %s:' % path, 'red')
+        print error
+
+    if failures:
+        print colored('%i of %i transcripts failed' % (len(failures), len(changed)), 'red')
+
+    failed = set(path for path, error in failures)
+
+    # Reconcile with the corpus rather than trusting the manifest, so a
+    # deleted database or an earlier failed update is caught up
+    stored = set(corpus.load().slugs())
+    live = set(_slug_from_path(path) for path in paths)
+    recounted = set(changed) - failed
+
+    to_store = [
+        path for path in paths
+        if path not in failed
+        and os.path.exists(_count_path(path))
+        and (path in recounted or _slug_from_path(path) not in stored)
+    ]
+
+    if to_store or stored - live:
+        update_corpus(to_store, paths)
+
+    # Only once the corpus is up to date, so a failed update is retried
+    _write_analysis_manifest(manifest)
+
+    if changed or removed or not os.path.exists(catalog.CATALOG_PATH):
+        build_catalog()
+
+def _analyzer_version():
+    """
+    Identify the analyzer settings, so changing them invalidates old counts.
+    """
+    return '%i:%i:%i:%i:%i' % (ANALYZER_VERSION, NGRAM_ORDER, NGRAM_MIN_COUNT, TOP_N, FILTER_STOPWORDS)
+
+def _hash_file(path):
+    with open(path, 'rb') as f:
+        return hashlib.sha1(f.read()).hexdigest()
+
+def _slug_from_path(path):
+    filename = os.path.split(path)[1]
+
+    return os.path.splitext(filename)[0]
+
+def _count_path(path):
+    """
+    Get the count file for a transcript. Several briefings can share a
+    date, so counts are keyed by the transcript's slug.
+    """
+    return 'data/text/counts/%s.json' % _slug_from_path(path)
+
+def _top_path(path):
+    """
+    Get the top n-grams file for a transcript, which sits beside its counts.
+    """
+    return 'data/text/top/%s.json' % _slug_from_path(path)
+
+def _remove_stale_counts(manifest, paths):
+    """
+    Forget transcripts that no longer exist and delete any count or top
+    file that doesn't belong to a current transcript.
+    """
+    live = set(paths)
+    live_outputs = set(_count_path(path) for path in paths) | set(_top_path(path) for path in paths)
+    removed = []
+
+    for path in manifest.keys():
+        if path not in live:
+            del manifest[path]
+
+    for path in glob('data/text/counts/*.json') + glob('data/text/top/*.json'):
+        if path not in live_outputs:
+            print 'Removing %s' % path
+            os.remove(path)
+            removed.append(path)
+
+    return removed
+
+def _read_analysis_manifest():
+    if not os.path.exists(ANALYSIS_MANIFEST_PATH):
+        return {}
+
+    with open(ANALYSIS_MANIFEST_PATH, 'r') as f:
+        return json.load(f)
+
+def _write_analysis_manifest(manifest):
+    with open('%s.tmp' % ANALYSIS_MANIFEST_PATH, 'w') as f:
+        json.dump(manifest, f, indent=4, sort_keys=True)
+
+    os.rename('%s.tmp' % ANALYSIS_MANIFEST_PATH, ANALYSIS_MANIFEST_PATH)
+
+def _analyze_transcript(path):
+    """
+    Pool worker: count one transcript, returning the error instead of raising.
+    """
+    try:
         _count_words(path)
+    except Exception:
+        return path, traceback.format_exc()
 
-def _count_words(path):
-    print path
+    return path, None
 
-    word_count = defaultdict(int)
+def _store_briefing(store, path, sources):
+    """
+    Add a counted transcript to the corpus.
+    """
+    slug = _slug_from_path(path)
+    date = datetime.strptime('-'.join(slug.split('-')[:3]), '%m-%d-%y').strftime('%Y-%m-%d')
+    source = sources.get(slug, {})
 
     with open(path, 'r') as f:
-        tokens = nltk.word_tokenize(f.read().decode('utf-8').lower())
+        text = f.read().decode('utf-8')
 
-    word_counts = nltk.FreqDist(tokens)
+    with open(_count_path(path), 'r') as f:
+        counts = json.load(f)
 
-    for word, count in word_counts.items():
-        word_count[word] = count 
-    
-    bigrams = nltk.bigrams(tokens)
-    bigram_counts = nltk.FreqDist(bigrams)
+    store.store_briefing(slug, date, text, counts, source.get('title'), source.get('transcript_url'))
 
-    for bigram, count in bigram_counts.items():
-        word_count['%s %s' % bigram] = count
+def update_corpus(changed, paths):
+    """
+    Store `changed` transcripts in the corpus, drop any that are no longer
+    among `paths` and update the weekly aggregates for the affected weeks.
+    """
+    store = corpus.load()
+    sources = dict((_briefing_slug(row), row) for row in read_links())
 
-    trigrams = nltk.trigrams(tokens)
-    trigram_counts = nltk.FreqDist(trigrams)
+    live = set(_slug_from_path(path) for path in paths)
 
-    for trigram, count in trigram_counts.items():
-        word_count['%s %s %s' % trigram] = count
+    for slug in store.slugs():
+        if slug not in live:
+            store.remove_briefing(slug)
 
-    filename = path.split('/')[2]
-    count_date = '%s-%s-%s' % (filename.split('-')[0], filename.split('-')[1], filename.split('-')[2])
+    for path in changed:
+        _store_briefing(store, path, sources)
 
-    with open('data/text/counts/%s.json' % count_date, 'w') as f:
-        json.dump({ 'words': word_count }, f)
+    print 'Stored %i briefings, updated %i weeks' % (len(changed), store.update_weeks())
 
 @task
-def analyze_words():
-    _generate_word_summary()
-    #get_trend_data()
-    merge_count_data()
-    merge_synonym_counts()
+def migrate_corpus():
+    """
+    Load every counted transcript into the corpus database.
+    """
+    paths = sorted(glob('data/text/*.txt'))
 
-def _generate_word_summary():
-    output = {}
+    update_corpus([path for path in paths if os.path.exists(_count_path(path))], paths)
 
-    for sunday in all_sundays(2014):
-        sunday_str = sunday.strftime('%Y-%m-%d')
-        output[sunday_str] = defaultdict(int)
+@task
+def build_catalog():
+    """
+    Build the briefing catalog used by the index pages.
+    """
+    sources = dict((_briefing_slug(row), row) for row in read_links())
 
-    for path in glob('data/text/counts/*.json'):
-        directory, filename = os.path.split(path)
-        date, extension = os.path.splitext(filename)
+    count = catalog.build_catalog(sorted(glob('data/text/*.txt')), _count_path, sources)
 
-        d = datetime.strptime(date, '%m-%d-%y')
+    print 'Cataloged %i briefings' % count
 
-        if d.year != 2014:
-            continue
+_stopwords = None
+
+def _get_stopwords():
+    """
+    English stopwords, plus the punctuation tokens word_tokenize produces.
+    """
+    global _stopwords
+
+    if _stopwords is None:
+        _stopwords = set(nltk.corpus.stopwords.words('english'))
+        _stopwords.update(string.punctuation)
+        _stopwords.update(['``', "''", '--', '...', "'s", "n't"])
+
+    return _stopwords
+
+def _count_words(path):
+    with open(path, 'r') as f:
+        text = f.read().decode('utf-8')
+
+    stopwords = _get_stopwords() if FILTER_STOPWORDS else ()
 
-        while d.weekday() != 6:
-            d = d - timedelta(days=1)
+    output = speakers.count_speakers(text, nltk.word_tokenize, NGRAM_ORDER, NGRAM_MIN_COUNT, TOP_N, stopwords)
 
-        sunday = d.strftime('%Y-%m-%d')
+    # Written separately, so briefing pages don't load every n-gram
+    top = {
+        'count': output['count'],
+        'orders': output.pop('top')
+    }
+
+    _write_json(_count_path(path), output)
+    _write_json(_top_path(path), top)
+
+def _write_json(path, data):
+    """
+    Write compact JSON atomically, so readers never see a partial file.
+    """
+    with open('%s.tmp' % path, 'w') as f:
+        json.dump(data, f, separators=(',', ':'))
+
+    os.rename('%s.tmp' % path, path)
+
+def _freqdist_counts(tokens):
+    """
+    The original three-pass FreqDist counter, kept for benchmark_ngrams.
+    """
+    word_count = defaultdict(int)
+
+    for word, count in nltk.FreqDist(tokens).items():
+        word_count[word] = count
+
+    for bigram, count in nltk.FreqDist(nltk.bigrams(tokens)).items():
+        word_count['%s %s' % bigram] = count
 
+    for trigram, count in nltk.FreqDist(nltk.trigrams(tokens)).items():
+        word_count['%s %s %s' % trigram] = count
+
+    return { 'words': word_count }
+
+def _ngram_counts(tokens):
+    return { 'ngrams': ngrams.encode(ngrams.count_ngrams(tokens, NGRAM_ORDER, NGRAM_MIN_COUNT)) }
+
+def _benchmark_counter(counter, paths, queue):
+    """
+    Time a counter over tokenized transcripts. Runs in its own process so
+    peak memory isn't polluted by the other counter.
+    """
+    transcripts = []
+
+    for path in paths:
         with open(path, 'r') as f:
-            data = json.load(f)
+            transcripts.append(nltk.word_tokenize(f.read().decode('utf-8').lower()))
+
+    start_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    elapsed = 0
+    size = 0
+
+    for tokens in transcripts:
+        start = time()
+        output = json.dumps(counter(tokens), separators=(',', ':'))
+        elapsed += time() - start
+        size += len(output)
+
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - start_rss
+
+    queue.put((elapsed, size, peak_rss))
+
+@task
+def benchmark_ngrams(limit=50):
+    """
+    Compare the single-pass n-gram counter with the FreqDist implementation.
+    """
+    paths = sorted(glob('data/text/*.txt'))[:int(limit)]
+
+    if not paths:
+        print 'No transcripts in data/text, run data.scrape_briefings first'
+        return
+
+    print 'Benchmarking %i transcripts (order %i, min count %i)' % (len(paths), NGRAM_ORDER, NGRAM_MIN_COUNT)
+
+    for name, counter in [('freqdist', _freqdist_counts), ('ngrams', _ngram_counts)]:
+        queue = Queue()
+        process = Process(target=_benchmark_counter, args=(counter, paths, queue))
+        process.start()
+        elapsed, size, peak_rss = queue.get()
+        process.join()
+
+        print '%-10s %8.1f ms/transcript %8.1f KB json/transcript %8i KB peak rss growth' % (
+            name,
+            elapsed * 1000 / len(paths),
+            size / 1024.0 / len(paths),
+            peak_rss
+        )
+
+@task
+def analyze_words(start_year=2014, end_year=None):
+    """
+    Summarize search term counts by week for a range of years.
+    """
+    start_year, end_year = _year_range(start_year, end_year)
+
+    build_term_matrix()
+    #get_trend_data()
+    merge_count_data(start_year, end_year)
+    merge_synonym_counts(start_year, end_year)
+
+def _year_range(start_year, end_year):
+    """
+    Normalize year arguments (which may be strings from fab) to ints.
+    """
+    start_year = int(start_year)
+    end_year = int(end_year) if end_year else start_year
+
+    return start_year, end_year
 
-            for word in SEARCH_TERMS:
-                count = data['words'].get(word, 0)
-                output[sunday][word] += count
+@task
+def build_term_matrix():
+    """
+    Reduce every count file into the term-by-week and term-by-briefing matrices.
+    """
+    extra_terms = set(SEARCH_TERMS)
 
-            with open('data/text/summary/2014.json', 'w') as f:
-                f.write(json.dumps(output))
+    for synonyms in SYNONYMS:
+        extra_terms.update(synonyms)
+
+    terms, weeks = term_matrix.build_matrix(glob('data/text/counts/*.json'), sorted(extra_terms))
+
+    print 'Built %i terms x %i weeks' % (terms, weeks)
 
 def all_sundays(year):
     d = date(year, 1, 1)                    # January 1st
@@ -227,6 +723,11 @@ def all_sundays(year):
         yield d
         d += timedelta(days = 7)
 
+def _all_sundays(start_year, end_year):
+    for year in range(start_year, end_year + 1):
+        for sunday in all_sundays(year):
+            yield sunday
+
 @task
 def get_trend_data():
     API_URL = 'https://www.googleapis.com/discovery/v1/apis/trends/v1beta/rest'
@@ -270,9 +771,10 @@ def get_trend_data():
         f.write(json.dumps(output))
 
 @task
-def merge_count_data():
-    with open('data/text/summary/2014.json', 'r') as wh:
-        press_briefings = json.load(wh)
+def merge_count_data(start_year=2014, end_year=None):
+    start_year, end_year = _year_range(start_year, end_year)
+
+    matrix = term_matrix.TermMatrix()
 
     with open('data/text/summary/google.json', 'r') as g:
         google_trends = json.load(g)
@@ -284,16 +786,18 @@ def merge_count_data():
     for word in SEARCH_TERMS:
         sheet = book.add_sheet(word)
 
+        counts = dict(zip(*matrix.week_counts([word], '%i-01-01' % start_year, '%i-01-01' % (end_year + 1))))
+
         header = sheet.row(0)
 
         for i, col in enumerate(['Week', 'Count']):
             header.write(i, col)
 
-        for i, sunday in enumerate(all_sundays(2014)):
+        for i, sunday in enumerate(_all_sundays(start_year, end_year)):
             row = sheet.row(i + 1)
 
             sunday = sunday.strftime('%Y-%m-%d')
-            count = press_briefings[sunday].get(word, 0)
+            count = int(counts.get(sunday, 0))
             #google = google_trends[sunday].get(word, 0)
             
             for i, col in enumerate([sunday, count]):
@@ -302,12 +806,13 @@ def merge_count_data():
     book.save('data/text/summary/terms.xls')
 
 @task
-def merge_synonym_counts():
+def merge_synonym_counts(start_year=2014, end_year=None):
     """
     Merge counts for synonyms.
     """
-    with open('data/text/summary/2014.json', 'r') as wh:
-        press_briefings = json.load(wh)
+    start_year, end_year = _year_range(start_year, end_year)
+
+    matrix = term_matrix.TermMatrix()
 
     from xlwt import Workbook
 
@@ -316,21 +821,20 @@ def merge_synonym_counts():
     for synonyms in SYNONYMS:
         sheet = book.add_sheet('%s (+%i)' % (synonyms[0], len(synonyms)))
 
+        # Synonym counts are the sum of their rows
+        counts = dict(zip(*matrix.week_counts(synonyms, '%i-01-01' % start_year, '%i-01-01' % (end_year + 1))))
+
         header = sheet.row(0)
 
         for i, col in enumerate(['Week', 'Count']):
             header.write(i, col)
 
-        for i, sunday in enumerate(all_sundays(2014)):
+        for i, sunday in enumerate(_all_sundays(start_year, end_year)):
             row = sheet.row(i + 1)
 
             sunday = sunday.strftime('%Y-%m-%d')
+            count = int(counts.get(sunday, 0))
 
-            count = 0
-
-            for word in synonyms:
-                count += press_briefings[sunday].get(word, 0)
-            
             for i, col in enumerate([sunday, count]):
                 row.write(i, col)
 
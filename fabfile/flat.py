@@ -1,18 +1,41 @@
 #!/usr/bin/env python
 
-from cStringIO import StringIO
+import base64
 from fnmatch import fnmatch
 import gzip
 import hashlib
+import json
 import mimetypes
+from multiprocessing.pool import ThreadPool
 import os
+from tempfile import SpooledTemporaryFile
+import threading
 
 import boto
 from boto.s3.key import Key
 
 import app_config
+import precompress
 
-GZIP_FILE_TYPES = ['.html', '.js', '.json', '.css', '.xml']
+GZIP_FILE_TYPES = precompress.COMPRESSIBLE_TYPES
+
+# Number of concurrent uploads
+DEPLOY_WORKERS = 8
+
+# Files are read and compressed this many bytes at a time
+CHUNK_SIZE = 1024 * 1024
+
+# Compressed output stays in memory up to this size, then spools to disk
+SPOOL_MAX_SIZE = 8 * 1024 * 1024
+
+# Files this large are uploaded in parts (S3's minimum part size is 5MB)
+MULTIPART_THRESHOLD = 16 * 1024 * 1024
+MULTIPART_CHUNK_SIZE = 8 * 1024 * 1024
+
+# What was last deployed to each bucket, so unchanged files can be skipped
+DEPLOY_MANIFEST_PATH = '.deploy_manifest.json'
+
+_local = threading.local()
 
 class FakeTime:
     def time(self):
@@ -22,65 +45,213 @@ class FakeTime:
 # See: http://stackoverflow.com/questions/264224/setting-the-gzip-timestamp-from-python
 gzip.time = FakeTime()
 
-def deploy_file(connection, src, dst, max_age):
+def _get_bucket():
+    """
+    Get a bucket for the current thread. Boto connections aren't thread-safe.
+    """
+    name = app_config.S3_BUCKET['bucket_name']
+    buckets = _local.__dict__.setdefault('buckets', {})
+
+    if name not in buckets:
+        s3 = boto.connect_s3()
+        buckets[name] = s3.get_bucket(name, validate=False)
+
+    return buckets[name]
+
+def list_etags(bucket, dst):
+    """
+    Get the MD5 of every key under a folder, in one paginated listing.
+    """
+    etags = {}
+
+    for key in bucket.list(prefix='%s/' % dst):
+        etags[key.name] = key.etag.strip('"')
+
+    return etags
+
+class _HashingWriter(object):
+    """
+    File-like wrapper that hashes everything written through it, both as a
+    whole and in multipart-sized parts, so the ETag S3 will report is known
+    without reading the output back.
+    """
+    def __init__(self, f):
+        self.f = f
+        self.size = 0
+
+        self._md5 = hashlib.md5()
+        self._part_md5 = hashlib.md5()
+        self._part_size = 0
+        self._part_digests = []
+
+    def write(self, data):
+        if self.f:
+            self.f.write(data)
+
+        self.size += len(data)
+        self._md5.update(data)
+
+        while data:
+            chunk = data[:MULTIPART_CHUNK_SIZE - self._part_size]
+            data = data[len(chunk):]
+
+            self._part_md5.update(chunk)
+            self._part_size += len(chunk)
+
+            if self._part_size == MULTIPART_CHUNK_SIZE:
+                self._part_digests.append(self._part_md5.digest())
+                self._part_md5 = hashlib.md5()
+                self._part_size = 0
+
+    def flush(self):
+        if self.f:
+            self.f.flush()
+
+    def md5(self):
+        return self._md5.hexdigest(), base64.b64encode(self._md5.digest())
+
+    def etag(self):
+        """
+        The ETag S3 reports: the plain MD5 for a single upload, or the MD5
+        of the part MD5s and the part count for a multipart upload.
+        """
+        if self.size < MULTIPART_THRESHOLD:
+            return self.md5()[0]
+
+        digests = list(self._part_digests)
+
+        if self._part_size:
+            digests.append(self._part_md5.digest())
+
+        return '%s-%i' % (hashlib.md5(''.join(digests)).hexdigest(), len(digests))
+
+def _upload(k, f, size, headers, md5):
+    """
+    Upload a file object from its start, in parts if it is large.
+    """
+    f.seek(0)
+
+    if size < MULTIPART_THRESHOLD:
+        k.set_contents_from_file(f, headers, policy='public-read', md5=md5, size=size)
+        return
+
+    upload = k.bucket.initiate_multipart_upload(k.key, headers, policy='public-read')
+
+    try:
+        for part, offset in enumerate(range(0, size, MULTIPART_CHUNK_SIZE), 1):
+            f.seek(offset)
+            upload.upload_part_from_file(f, part, size=min(MULTIPART_CHUNK_SIZE, size - offset))
+
+        upload.complete_upload()
+    except:
+        upload.cancel_upload()
+        raise
+
+def deploy_file(src, dst, max_age, s3_md5=None):
     """
     Deploy a single file to S3, if the local version is different.
+
+    The file is gzipped (if needed) and hashed in chunks, spooling to disk
+    rather than memory once it gets large, and uploaded in parts above
+    MULTIPART_THRESHOLD. A current .gz sibling written by the render is
+    sent as-is instead.
+
+    `s3_md5` is the remote ETag, if the key exists. Returns whether the
+    file was uploaded and the ETag of what was (or would have been) sent.
     """
-    bucket = connection.get_bucket(app_config.S3_BUCKET['bucket_name'])
-    
-    k = bucket.get_key(dst)
-    s3_md5 = None
+    bucket = _get_bucket()
 
-    if k:
-        s3_md5 = k.etag.strip('"')
-    else:
-        k = Key(bucket) 
-        k.key = dst
+    k = Key(bucket)
+    k.key = dst
 
     headers = {
         'Content-Type': mimetypes.guess_type(src)[0],
         'Cache-Control': 'max-age=%i' % max_age 
     }
 
-    # Gzip file
-    if os.path.splitext(src)[1].lower() in GZIP_FILE_TYPES:
-        headers['Content-Encoding'] = 'gzip'
-    
-        with open(src, 'rb') as f_in:
-            contents = f_in.read()
+    gzipped = os.path.splitext(src)[1].lower() in GZIP_FILE_TYPES
+    precompressed = precompress.variant_path(src, 'gzip') if gzipped else None
 
-        output = StringIO()
-        f_out = gzip.GzipFile(filename=dst, mode='wb', fileobj=output)
-        f_out.write(contents)
-        f_out.close()
-    
-        local_md5 = hashlib.md5()
-        local_md5.update(output.getvalue())
-        local_md5 = local_md5.hexdigest()
-        
-        if local_md5 == s3_md5:
-            print 'Skipping %s (has not changed)' % src
-        else:
-            print 'Uploading %s --> %s (gzipped)' % (src, dst)
-            k.set_contents_from_string(output.getvalue(), headers, policy='public-read')
-    # Non-gzip file
-    else:
-        with open(src, 'rb') as f:
-            local_md5 = hashlib.md5()
-            local_md5.update(f.read())
-            local_md5 = local_md5.hexdigest()
-        
-        if local_md5 == s3_md5:
-            print 'Skipping %s (has not changed)' % src
+    with open(precompressed or src, 'rb') as f_in:
+        # Precompressed file
+        if precompressed:
+            headers['Content-Encoding'] = 'gzip'
+
+            output = f_in
+            writer = _HashingWriter(None)
+            f_out = writer
+        # Gzip file
+        elif gzipped:
+            headers['Content-Encoding'] = 'gzip'
+
+            output = SpooledTemporaryFile(max_size=SPOOL_MAX_SIZE)
+            writer = _HashingWriter(output)
+            f_out = gzip.GzipFile(filename=dst, mode='wb', fileobj=writer)
+        # Non-gzip file
         else:
-            print 'Uploading %s --> %s' % (src, dst)
-            k.set_contents_from_filename(src, headers, policy='public-read')
+            output = f_in
+            writer = _HashingWriter(None)
+            f_out = writer
+
+        try:
+            for chunk in iter(lambda: f_in.read(CHUNK_SIZE), ''):
+                f_out.write(chunk)
+
+            if gzipped and not precompressed:
+                f_out.close()
 
-def deploy_folder(src, dst, max_age=app_config.DEFAULT_MAX_AGE, ignore=[]):
+            local_md5 = writer.etag()
+
+            if local_md5 == s3_md5:
+                print 'Skipping %s (has not changed)' % src
+                return False, local_md5
+
+            print 'Uploading %s --> %s%s' % (src, dst, ' (gzipped)' if gzipped else '')
+            _upload(k, output, writer.size, headers, writer.md5())
+        finally:
+            output.close()
+
+    return True, local_md5
+
+def _read_deploy_manifest():
+    """
+    Get what was last deployed to the current bucket, keyed by S3 key.
+    """
+    if not os.path.exists(DEPLOY_MANIFEST_PATH):
+        return {}
+
+    with open(DEPLOY_MANIFEST_PATH, 'r') as f:
+        return json.load(f).get(app_config.S3_BUCKET['bucket_name'], {})
+
+def _write_deploy_manifest(deployed):
+    manifest = {}
+
+    if os.path.exists(DEPLOY_MANIFEST_PATH):
+        with open(DEPLOY_MANIFEST_PATH, 'r') as f:
+            manifest = json.load(f)
+
+    manifest[app_config.S3_BUCKET['bucket_name']] = deployed
+
+    with open('%s.tmp' % DEPLOY_MANIFEST_PATH, 'w') as f:
+        json.dump(manifest, f, indent=4, sort_keys=True)
+
+    os.rename('%s.tmp' % DEPLOY_MANIFEST_PATH, DEPLOY_MANIFEST_PATH)
+
+def deploy_folder(src, dst, max_age=app_config.DEFAULT_MAX_AGE, ignore=[], workers=DEPLOY_WORKERS, verify=False, max_ages={}):
     """
     Deploy a folder to S3, checking each file to see if it has changed.
+
+    `max_ages` maps patterns to a max age for matching files, overriding
+    `max_age`.
+
+    Files whose size and mtime match the local deploy manifest are skipped
+    without being read. Remote ETags are only listed (in a single request)
+    for files the manifest doesn't know, or for every file if `verify` is
+    True. Changed files are uploaded by `workers` threads. Returns the
+    uploaded keys.
     """
     to_deploy = []
+    variants = precompress.read_manifest()
 
     for local_path, subdirs, filenames in os.walk(src, topdown=True):
         rel_path = os.path.relpath(local_path, src)
@@ -91,6 +262,10 @@ def deploy_folder(src, dst, max_age=app_config.DEFAULT_MAX_AGE, ignore=[]):
                 
             src_path = os.path.join(local_path, name)
 
+            # Sent in place of their source by deploy_file
+            if precompress.is_variant(src_path, variants):
+                continue
+
             skip = False
 
             for pattern in ignore:
@@ -106,12 +281,65 @@ def deploy_folder(src, dst, max_age=app_config.DEFAULT_MAX_AGE, ignore=[]):
             else:
                 dst_path = os.path.join(dst, rel_path, name)
 
-            to_deploy.append((src_path, dst_path))
+            file_max_age = max_age
 
-    s3 = boto.connect_s3() 
+            for pattern, pattern_max_age in max_ages.items():
+                if fnmatch(src_path, pattern):
+                    file_max_age = pattern_max_age
+                    break
+
+            to_deploy.append((src_path, dst_path, file_max_age))
+
+    verify = str(verify).lower() in ('true', '1', 'yes')
+    deployed = _read_deploy_manifest()
+
+    if verify or any(dst_path not in deployed for src_path, dst_path, file_max_age in to_deploy):
+        etags = list_etags(_get_bucket(), dst)
+    else:
+        etags = None
+
+    def deploy(paths):
+        src_path, dst_path, file_max_age = paths
+
+        stat = os.stat(src_path)
+        entry = deployed.get(dst_path)
+
+        if entry and not verify and entry['src'] == src_path and entry['size'] == stat.st_size and entry['mtime'] == stat.st_mtime:
+            return dst_path, False, entry
+
+        if etags is not None:
+            s3_md5 = etags.get(dst_path)
+        else:
+            s3_md5 = entry['md5']
+
+        uploaded, md5 = deploy_file(src_path, dst_path, file_max_age, s3_md5)
+
+        return dst_path, uploaded, {
+            'src': src_path,
+            'size': stat.st_size,
+            'mtime': stat.st_mtime,
+            'md5': md5
+        }
+
+    pool = ThreadPool(int(workers))
+
+    try:
+        results = pool.map(deploy, to_deploy)
+    finally:
+        pool.close()
+        pool.join()
+
+    # Forget files that have been removed from this folder
+    for dst_path, entry in deployed.items():
+        if entry['src'].startswith(os.path.join(src, '')) and not os.path.exists(entry['src']):
+            del deployed[dst_path]
 
-    for src, dst in to_deploy:
-        deploy_file(s3, src, dst, max_age)
+    for dst_path, uploaded, entry in results:
+        deployed[dst_path] = entry
+
+    _write_deploy_manifest(deployed)
+
+    return [dst_path for dst_path, uploaded, entry in results if uploaded]
 
 def delete_folder(dst):
     """
@@ -126,3 +354,11 @@ def delete_folder(dst):
 
         key.delete()
 
+    deployed = _read_deploy_manifest()
+
+    for dst_path in deployed.keys():
+        if dst_path.startswith('%s/' % dst):
+            del deployed[dst_path]
+
+    _write_deploy_manifest(deployed)
+
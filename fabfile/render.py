@@ -4,12 +4,29 @@
 Commands for rendering various parts of the app stack.
 """
 
+from collections import defaultdict
+from functools import partial
 from glob import glob
+import hashlib
+from itertools import imap, izip
+import json
+from multiprocessing import Pool, cpu_count
 import os
+import time
 
 from fabric.api import local, task
+from termcolor import colored
 
 import app
+import app_config
+import catalog
+import corpus
+import precompress
+
+RENDER_MANIFEST_PATH = '.render_manifest.json'
+
+# Assets written by the render itself
+GENERATED_ASSETS = ['www/js/templates.js', 'www/js/app_config.js', 'www/js/copy.js']
 
 def _fake_context(path):
     """
@@ -84,17 +101,139 @@ def copytext_js():
     with open('www/js/copy.js', 'w') as f:
         f.write(response.data)
 
+@task
+def time_context(n=100):
+    """
+    Time make_context, which runs once per rendered page.
+    """
+    from timeit import timeit
+
+    from render_utils import make_context
+
+    n = int(n)
+
+    with _fake_context('/'):
+        first = timeit(make_context, number=1)
+        rest = timeit(make_context, number=n)
+
+    print 'make_context: %.1f ms first call, %.2f ms per call after' % (first * 1000, rest * 1000 / n)
+
+def _files_signature(paths):
+    """
+    Fingerprint a set of input files by name, size and mtime.
+    """
+    stats = []
+
+    for path in sorted(paths):
+        if os.path.exists(path):
+            stat = os.stat(path)
+            stats.append([path, stat.st_size, stat.st_mtime])
+
+    return hashlib.md5(json.dumps(stats)).hexdigest()
+
+def _walk(*roots):
+    for root in roots:
+        for dirpath, dirnames, filenames in os.walk(root):
+            for name in filenames:
+                yield os.path.join(dirpath, name)
+
+def _asset_sources():
+    """
+    Source files that feed the compiled CSS and JS bundles, excluding
+    anything the render itself writes.
+    """
+    from render_utils import read_asset_manifest
+
+    generated = GENERATED_ASSETS + ['www/%s' % path for path in read_asset_manifest().values()]
+
+    return [
+        path for path in _walk('less', 'www/js', 'www/css')
+        if path not in generated
+        and not path.endswith(('.min.js', '.min.css', '.less.css', '.gz', '.br'))
+    ]
+
+def _input_signatures():
+    """
+    Fingerprint each kind of input a rendered file can depend on.
+    """
+    from render_utils import BetterJSONEncoder, flatten_app_config
+
+    config = json.dumps(flatten_app_config(), cls=BetterJSONEncoder, sort_keys=True)
+
+    return {
+        'templates': _files_signature(_walk('templates')),
+        'copy': _files_signature([app_config.COPY_PATH]),
+        'config': hashlib.md5(config).hexdigest(),
+        'assets': _files_signature(_asset_sources()),
+        'less': _files_signature(_walk('less')),
+        'jst': _files_signature(_walk('jst')),
+        'data': _files_signature(['data/featured.json', catalog.CATALOG_PATH] + glob('data/text/*.txt'))
+    }
+
+def _read_render_manifest():
+    if not os.path.exists(RENDER_MANIFEST_PATH):
+        return {}
+
+    with open(RENDER_MANIFEST_PATH, 'r') as f:
+        return json.load(f)
+
+def _write_render_manifest(manifest):
+    with open('%s.tmp' % RENDER_MANIFEST_PATH, 'w') as f:
+        json.dump(manifest, f, indent=4, sort_keys=True)
+
+    os.rename('%s.tmp' % RENDER_MANIFEST_PATH, RENDER_MANIFEST_PATH)
+
+def _is_fresh(manifest, path, inputs):
+    """
+    Was `path` last rendered from exactly these inputs?
+    """
+    return os.path.exists(path) and manifest.get(path) == inputs
+
 @task(default=True)
-def render_all():
+def render_all(jobs=None, force=False):
     """
     Render HTML templates and compile assets.
+
+    Files whose inputs haven't changed since the last render are skipped;
+    pass force=True to render everything. Briefing pages are rendered by
+    `jobs` processes (default: one per core).
     """
     from flask import g
 
-    less()
-    jst()
-    app_config_js()
-    copytext_js()
+    from render_utils import write_asset_manifest
+
+    force = str(force).lower() in ('true', '1', 'yes')
+    manifest = {} if force else _read_render_manifest()
+    signatures = _input_signatures()
+
+    timings = defaultdict(list)
+
+    less_outputs = [
+        'www/css/%s.less.css' % os.path.splitext(os.path.split(path)[-1])[0] for path in glob('less/*.less')
+    ]
+
+    steps = [
+        ('less', less, less_outputs, ['less']),
+        ('jst', jst, ['www/js/templates.js'], ['jst']),
+        ('app_config_js', app_config_js, ['www/js/app_config.js'], ['config']),
+        ('copytext_js', copytext_js, ['www/js/copy.js'], ['copy'])
+    ]
+
+    for name, step, outputs, keys in steps:
+        inputs = dict((key, signatures[key]) for key in keys)
+
+        # Steps are tracked as a whole, since LESS writes one file per input
+        if manifest.get('step:%s' % name) == inputs and all(os.path.exists(path) for path in outputs):
+            print 'Skipping %s (inputs unchanged)' % name
+            continue
+
+        start = time.time()
+        step()
+        timings['assets'].append(time.time() - start)
+
+        manifest['step:%s' % name] = inputs
+
+    page_inputs = dict((key, signatures[key]) for key in ['templates', 'copy', 'config', 'assets', 'less', 'jst', 'data'])
 
     compiled_includes = {}
 
@@ -117,6 +256,10 @@ def render_all():
             print 'Skipping %s' % name
             continue
 
+        if _is_fresh(manifest, filename, page_inputs):
+            print 'Skipping %s (inputs unchanged)' % filename
+            continue
+
         # Create the output path
         dirname = os.path.dirname(filename)
 
@@ -125,6 +268,8 @@ def render_all():
 
         print 'Rendering %s' % (filename)
 
+        start = time.time()
+
         # Render views, reusing compiled assets
         with _fake_context(rule_string):
             g.compile_includes = True
@@ -141,35 +286,193 @@ def render_all():
         with open(filename, 'w') as f:
             f.write(content)
 
-    render_briefings(compiled_includes)
+        manifest[filename] = page_inputs
+        timings['views'].append(time.time() - start)
 
-@task
-def render_briefings(compiled_includes):
-    from flask import g, url_for
+    # The first page of the catalog is the index, rendered above
+    for number in range(2, catalog.load().page_count() + 1):
+        filename = 'www/page/%i/index.html' % number
 
-    for path in glob('data/text/*.txt'):
-        directory, filename = os.path.split(path)
-        slug, extension = os.path.splitext(filename)
+        if _is_fresh(manifest, filename, page_inputs):
+            continue
 
-        with app.app.test_request_context():
-            path = '%sindex.html' % url_for('_briefing', slug=slug)
+        print 'Rendering %s' % filename
 
-        with app.app.test_request_context(path=path):
-            print 'Rendering %s' % path
+        start = time.time()
 
+        with _fake_context('/page/%i/' % number):
             g.compile_includes = True
             g.compiled_includes = compiled_includes
 
-            view = app.__dict__['_briefing']
-            content = view(slug).data
+            content = app._index_page(number).data
 
-        output_path = '.briefings_html%s' % path
-        head = os.path.split(output_path)[0]
+            compiled_includes = g.compiled_includes
 
-        try:
-            os.makedirs(head)
-        except OSError:
-            pass
+        if not os.path.exists(os.path.dirname(filename)):
+            os.makedirs(os.path.dirname(filename))
 
-        with open(output_path, 'w') as f:
+        with open(filename, 'w') as f:
             f.write(content)
+
+        manifest[filename] = page_inputs
+        timings['views'].append(time.time() - start)
+
+    try:
+        render_briefings(compiled_includes, jobs, timings, manifest, signatures)
+    finally:
+        _write_render_manifest(manifest)
+
+    write_asset_manifest(compiled_includes)
+
+    # Compress text assets once here, rather than on every deploy or request
+    start = time.time()
+    written = precompress.compress_folder('www') + precompress.compress_folder('.briefings_html')
+    timings['compress'].append(time.time() - start)
+
+    print 'Wrote %i precompressed files' % written
+
+    _print_timings(timings)
+
+@task
+def render_briefings(compiled_includes=None, jobs=None, timings=None, manifest=None, signatures=None):
+    """
+    Render a page for every briefing, using `jobs` processes (default: one per core).
+
+    When called from render_all, pages whose inputs are unchanged are skipped.
+    """
+    from render_utils import write_asset_manifest
+
+    jobs = int(jobs) if jobs else cpu_count()
+
+    if compiled_includes is None:
+        compiled_includes = {}
+
+    report = timings is None
+
+    if report:
+        timings = defaultdict(list)
+
+    if manifest is None:
+        manifest = {}
+
+    if signatures is None:
+        signatures = _input_signatures()
+
+    page_inputs = dict((key, signatures[key]) for key in ['templates', 'copy', 'config', 'assets', 'less', 'jst'])
+
+    slugs = []
+    slug_inputs = {}
+
+    store = corpus.load()
+
+    if not store.briefing_count():
+        print colored('The corpus is empty, run data.migrate_corpus first', 'red')
+
+    for slug in sorted(store.slugs()):
+        inputs = dict(page_inputs)
+        inputs['counts'] = _files_signature([_briefing_counts_path(slug)])
+
+        if _is_fresh(manifest, _briefing_output_path(slug), inputs):
+            continue
+
+        slugs.append(slug)
+        slug_inputs[slug] = inputs
+
+    print 'Rendering %i briefing pages' % len(slugs)
+
+    if not slugs:
+        return
+
+    # Render one page here first, so any includes it needs are compiled
+    # once before the workers share them read-only
+    path, elapsed = _render_briefing(slugs[0], compiled_includes)
+    print 'Rendering %s' % path
+    timings['briefings'].append(elapsed)
+    manifest[_briefing_output_path(slugs[0])] = slug_inputs[slugs[0]]
+
+    if jobs > 1 and len(slugs) > 2:
+        pool = Pool(jobs, initializer=_init_briefing_worker, initargs=(compiled_includes,))
+        results = pool.imap(_render_briefing, slugs[1:])
+    else:
+        pool = None
+        results = imap(partial(_render_briefing, compiled_includes=compiled_includes), slugs[1:])
+
+    try:
+        for slug, (path, elapsed) in izip(slugs[1:], results):
+            print 'Rendering %s' % path
+            timings['briefings'].append(elapsed)
+            manifest[_briefing_output_path(slug)] = slug_inputs[slug]
+    finally:
+        if pool:
+            pool.close()
+            pool.join()
+
+    if report:
+        # render_all records compiled assets itself once every page is done
+        write_asset_manifest(compiled_includes)
+
+        _print_timings(timings)
+
+def _briefing_counts_path(slug):
+    return 'data/text/top/%s.json' % slug
+
+def _briefing_output_path(slug):
+    return '.briefings_html/briefing/%s/index.html' % slug
+
+_worker_includes = None
+
+def _init_briefing_worker(compiled_includes):
+    global _worker_includes
+
+    _worker_includes = compiled_includes
+
+def _render_briefing(slug, compiled_includes=None):
+    """
+    Render one briefing page. Returns its URL path and the time it took.
+    """
+    from flask import g, url_for
+
+    if compiled_includes is None:
+        compiled_includes = _worker_includes
+
+    start = time.time()
+
+    with app.app.test_request_context():
+        path = '%sindex.html' % url_for('_briefing', slug=slug)
+
+    with app.app.test_request_context(path=path):
+        g.compile_includes = True
+        g.compiled_includes = compiled_includes
+
+        view = app.__dict__['_briefing']
+        content = view(slug).data
+
+    output_path = '.briefings_html%s' % path
+    head = os.path.split(output_path)[0]
+
+    try:
+        os.makedirs(head)
+    except OSError:
+        pass
+
+    with open(output_path, 'w') as f:
+        f.write(content)
+
+    return path, time.time() - start
+
+def _print_timings(timings):
+    """
+    Summarize render time by page type.
+    """
+    print 'Render times:'
+
+    for name in sorted(timings):
+        times = timings[name]
+
+        print '    %-10s %5i pages %8.2fs total %8.1f ms mean %8.1f ms max' % (
+            name,
+            len(times),
+            sum(times),
+            sum(times) * 1000 / len(times),
+            max(times) * 1000
+        )
@@ -0,0 +1,106 @@
+#!/usr/bin/env python
+
+"""
+Concurrent page fetching with a shared per-host rate limit.
+"""
+
+from functools import partial
+from multiprocessing.pool import ThreadPool
+import threading
+import time
+from urlparse import urlparse
+
+from scrapelib import Scraper, FileCache
+
+class RateLimiter(object):
+    """
+    Spaces out requests to each host, across every thread that shares it.
+    """
+    def __init__(self, requests_per_minute=60):
+        if requests_per_minute:
+            self.interval = 60.0 / requests_per_minute
+        else:
+            self.interval = 0
+
+        self._lock = threading.Lock()
+        self._next_slot = {}
+
+    def wait(self, host):
+        """
+        Block until a request to `host` is allowed.
+        """
+        with self._lock:
+            now = time.time()
+            slot = max(now, self._next_slot.get(host, 0))
+            self._next_slot[host] = slot + self.interval
+
+        if slot > now:
+            time.sleep(slot - now)
+
+class LimitedScraper(Scraper):
+    """
+    A Scraper throttled by a shared RateLimiter instead of its own timer.
+
+    The limiter is applied in `send`, which is only reached when the
+    response is not in the cache, so cache hits are never throttled.
+    """
+    def __init__(self, limiter, **kwargs):
+        kwargs['requests_per_minute'] = 0
+
+        Scraper.__init__(self, **kwargs)
+
+        self.limiter = limiter
+
+    def send(self, request, **kwargs):
+        self.limiter.wait(urlparse(request.url).netloc)
+
+        return Scraper.send(self, request, **kwargs)
+
+class Fetcher(object):
+    """
+    Fetch pages with a pool of worker threads.
+
+    Each thread gets its own scraper (sessions aren't thread-safe), but
+    they all share one cache directory and one rate limit.
+    """
+    def __init__(self, workers=8, requests_per_minute=60, cache_dir=None):
+        self.workers = workers
+        self.limiter = RateLimiter(requests_per_minute)
+        self.cache = FileCache(cache_dir) if cache_dir else None
+        self._local = threading.local()
+
+    def _scraper(self):
+        scraper = getattr(self._local, 'scraper', None)
+
+        if scraper is None:
+            scraper = LimitedScraper(self.limiter)
+            scraper.cache_storage = self.cache
+            scraper.cache_write_only = False
+
+            self._local.scraper = scraper
+
+        return scraper
+
+    def fetch(self, url, refresh=False):
+        """
+        Fetch a single page.
+
+        If `refresh` is True the cache is bypassed (but still updated).
+        """
+        scraper = self._scraper()
+        scraper.cache_write_only = refresh
+
+        return scraper.urlopen(url)
+
+    def fetch_all(self, urls, refresh=False):
+        """
+        Fetch a list of pages, yielding responses in the same order as `urls`.
+        """
+        pool = ThreadPool(self.workers)
+
+        try:
+            for response in pool.imap(partial(self.fetch, refresh=refresh), urls):
+                yield response
+        finally:
+            pool.terminate()
+            pool.join()
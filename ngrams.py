@@ -0,0 +1,148 @@
+#!/usr/bin/env python
+
+"""
+Single-pass n-gram counting and a compact encoding for the counts.
+
+Counts are keyed by space-joined tokens ("health care") as they always
+have been, so consumers can look up any order in one dict.
+"""
+
+from collections import defaultdict
+
+def new_counts(n=3):
+    """
+    Create empty counts for orders 1 through `n`, to fill with `update_ngrams`.
+    """
+    return [defaultdict(int) for i in range(0, n)]
+
+def update_ngrams(orders, tokens, start=0):
+    """
+    Add every n-gram ending at or after `tokens[start]` to `orders`.
+
+    Tokens before `start` are only used as left context, so a growing token
+    list can be counted incrementally without double counting.
+    """
+    n = len(orders)
+
+    for i in range(start, len(tokens)):
+        gram = tokens[i]
+        orders[0][gram] += 1
+
+        # Grow the n-gram ending at this token one word to the left
+        for size in range(2, min(n, i + 1) + 1):
+            gram = '%s %s' % (tokens[i - size + 1], gram)
+            orders[size - 1][gram] += 1
+
+def prune(orders, min_count=1):
+    """
+    Convert counts to plain dicts, dropping n-grams of order two and up seen
+    fewer than `min_count` times. Unigrams are always kept so totals stay
+    correct.
+    """
+    output = [dict(orders[0])]
+
+    for order in orders[1:]:
+        output.append(dict((gram, count) for gram, count in order.iteritems() if count >= min_count))
+
+    return output
+
+def count_ngrams(tokens, n=3, min_count=1):
+    """
+    Count every n-gram of order 1 through `n` in one pass over `tokens`.
+
+    Returns a list of dicts, one per order. See `prune` for `min_count`.
+    """
+    orders = new_counts(n)
+    update_ngrams(orders, tokens)
+
+    return prune(orders, min_count)
+
+def top_counts(orders, limit=100, stopwords=()):
+    """
+    Get the `limit` most frequent n-grams of each order, as a list of
+    [gram, count] rows per order, most frequent first.
+
+    N-grams made up entirely of `stopwords` are left out.
+    """
+    stopwords = set(stopwords)
+    output = []
+
+    for order in orders:
+        rows = [
+            [gram, count] for gram, count in order.iteritems()
+            if not all(word in stopwords for word in gram.split(' '))
+        ]
+
+        rows.sort(key=lambda row: (-row[1], row[0]))
+        output.append(rows[:limit])
+
+    return output
+
+def flatten(orders):
+    """
+    Merge per-order counts into a single dict.
+    """
+    output = {}
+
+    for order in orders:
+        output.update(order)
+
+    return output
+
+def encode(orders):
+    """
+    Encode per-order counts as a compact, JSON-serializable structure.
+
+    Each unigram is stored once in `vocab` (most frequent first, so common
+    words get short ids). Higher orders are flat lists of token ids, each
+    n-gram's ids followed by its count.
+    """
+    vocab = sorted(orders[0], key=lambda word: (-orders[0][word], word))
+    ids = dict((word, i) for i, word in enumerate(vocab))
+
+    counts = [[orders[0][word] for word in vocab]]
+
+    for order in orders[1:]:
+        flat = []
+
+        for gram in sorted(order):
+            flat.extend(ids[word] for word in gram.split(' '))
+            flat.append(order[gram])
+
+        counts.append(flat)
+
+    return {
+        'vocab': vocab,
+        'counts': counts
+    }
+
+def decode(encoded):
+    """
+    Decode `encode` output back into a flat dict of counts.
+    """
+    vocab = encoded['vocab']
+    counts = encoded['counts']
+
+    output = dict(zip(vocab, counts[0]))
+
+    for size, flat in enumerate(counts[1:], 2):
+        for i in range(0, len(flat), size + 1):
+            gram = ' '.join(vocab[j] for j in flat[i:i + size])
+            output[gram] = flat[i + size]
+
+    return output
+
+def read_counts(data):
+    """
+    Normalize a loaded count file so `words` is always a flat dict, both at
+    the top level and in per-speaker sections.
+
+    Accepts both the compact `ngrams` encoding and the older flat `words`.
+    """
+    sections = [data] + [value for value in data.values() if isinstance(value, dict)]
+
+    for section in sections:
+        if 'ngrams' in section:
+            section['words'] = decode(section.pop('ngrams'))
+
+    return data
@@ -0,0 +1,158 @@
+#!/usr/bin/env python
+
+"""
+Precompressed siblings (foo.js.gz, foo.js.br) for text assets.
+
+Siblings are written at render time and stamped with their source file's
+mtime, so they are only rebuilt when the source changes and can be checked
+for freshness with a stat(). Brotli variants are only written if the
+brotli module is installed.
+
+The siblings written are recorded in a manifest, so compressed files that
+ship as assets in their own right (www/assets/data.json.gz) are never
+mistaken for them.
+"""
+
+import gzip
+import json
+import os
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+COMPRESSIBLE_TYPES = ['.html', '.js', '.json', '.css', '.xml']
+
+# Fixed gzip header timestamp, so output only changes when content does
+GZIP_MTIME = 1261130520
+
+EXTENSIONS = {
+    'gzip': '.gz',
+    'br': '.br'
+}
+
+CHUNK_SIZE = 1024 * 1024
+
+PRECOMPRESS_MANIFEST_PATH = '.precompress_manifest.json'
+
+def is_compressible(path):
+    return os.path.splitext(path)[1].lower() in COMPRESSIBLE_TYPES
+
+def read_manifest():
+    """
+    Get the paths of every sibling written by compress_folder.
+    """
+    if not os.path.exists(PRECOMPRESS_MANIFEST_PATH):
+        return set()
+
+    with open(PRECOMPRESS_MANIFEST_PATH, 'r') as f:
+        return set(json.load(f))
+
+def _write_manifest(variants):
+    with open('%s.tmp' % PRECOMPRESS_MANIFEST_PATH, 'w') as f:
+        json.dump(sorted(variants), f, indent=4)
+
+    os.rename('%s.tmp' % PRECOMPRESS_MANIFEST_PATH, PRECOMPRESS_MANIFEST_PATH)
+
+def is_variant(path, variants=None):
+    """
+    Is `path` a compressed sibling written by compress_folder? Pass the
+    result of read_manifest() as `variants` when checking many paths.
+    """
+    if variants is None:
+        variants = read_manifest()
+
+    return os.path.relpath(path) in variants
+
+def encodings():
+    """
+    The encodings siblings are written in, preferred first.
+    """
+    if brotli:
+        return ['br', 'gzip']
+
+    return ['gzip']
+
+def variant_path(path, encoding):
+    """
+    Get the sibling of `path` in `encoding`, if it exists and is current.
+    """
+    compressed_path = path + EXTENSIONS[encoding]
+
+    try:
+        # utime() may round away sub-microsecond precision
+        if abs(os.path.getmtime(compressed_path) - os.path.getmtime(path)) < 0.001:
+            return compressed_path
+    except OSError:
+        pass
+
+    return None
+
+def _write_gzip(src, dst):
+    with open(src, 'rb') as f_in, open(dst, 'wb') as f:
+        f_out = gzip.GzipFile(filename=os.path.basename(src), mode='wb', fileobj=f, mtime=GZIP_MTIME)
+
+        for chunk in iter(lambda: f_in.read(CHUNK_SIZE), ''):
+            f_out.write(chunk)
+
+        f_out.close()
+
+def _write_brotli(src, dst):
+    with open(src, 'rb') as f_in, open(dst, 'wb') as f:
+        f.write(brotli.compress(f_in.read()))
+
+def compress_file(path):
+    """
+    Write any missing or stale compressed siblings of `path`. Returns the
+    number written.
+    """
+    writers = {
+        'gzip': _write_gzip,
+        'br': _write_brotli
+    }
+
+    stat = os.stat(path)
+    written = 0
+
+    for encoding in encodings():
+        if variant_path(path, encoding):
+            continue
+
+        compressed_path = path + EXTENSIONS[encoding]
+
+        writers[encoding](path, '%s.tmp' % compressed_path)
+        os.utime('%s.tmp' % compressed_path, (stat.st_atime, stat.st_mtime))
+        os.rename('%s.tmp' % compressed_path, compressed_path)
+
+        written += 1
+
+    return written
+
+def compress_folder(root):
+    """
+    Bring the compressed siblings of every text asset under `root` up to
+    date, removing those whose source is gone. Returns the number written.
+    """
+    old_variants = read_manifest()
+    prefix = os.path.join(os.path.relpath(root), '')
+
+    # Siblings outside `root` are left to their own runs
+    variants = set(path for path in old_variants if not path.startswith(prefix))
+    written = 0
+
+    for dirpath, dirnames, filenames in os.walk(root):
+        for name in filenames:
+            path = os.path.join(dirpath, name)
+
+            if os.path.relpath(path) in old_variants:
+                if not os.path.exists(os.path.splitext(path)[0]):
+                    os.remove(path)
+            elif is_compressible(path):
+                written += compress_file(path)
+
+                variants.update(os.path.relpath(path + EXTENSIONS[encoding]) for encoding in encodings())
+
+    _write_manifest(variants)
+
+    return written
@@ -2,18 +2,26 @@
 
 import codecs
 from datetime import datetime
+import hashlib
 import json
-import time
+import os
 import urllib
 
 from cssmin import cssmin
 from flask import Markup, g, render_template, request
+import pkg_resources
 from slimit import minify
 from smartypants import smartypants
 
 import app_config
 import copytext
 
+# Maps compiled asset paths to their content-hashed filenames
+ASSET_MANIFEST_PATH = '.asset_manifest.json'
+
+# Minified source files, keyed by content and minifier version
+MINIFY_CACHE_DIR = '.minify_cache'
+
 class BetterJSONEncoder(json.JSONEncoder):
     """
     A JSON encoder that intelligently handles datetimes.
@@ -26,6 +34,53 @@ class BetterJSONEncoder(json.JSONEncoder):
     
         return encoded_object
 
+_version_cache = {}
+
+def _package_version(name):
+    if name not in _version_cache:
+        try:
+            _version_cache[name] = pkg_resources.get_distribution(name).version
+        except pkg_resources.DistributionNotFound:
+            _version_cache[name] = 'unknown'
+
+    return _version_cache[name]
+
+def cached_minify(minifier, name, src, text):
+    """
+    Minify `text` with `minifier`, reusing the result from the last time
+    this exact text was minified by this version of the minifier.
+
+    `name` is the minifier's package name and `src` is only for logging.
+    """
+    key = hashlib.sha1()
+    key.update('%s %s\n' % (name, _package_version(name)))
+    key.update(text.encode('utf-8'))
+    key = key.hexdigest()
+
+    cache_path = os.path.join(MINIFY_CACHE_DIR, key[:2], key)
+
+    if os.path.exists(cache_path):
+        with codecs.open(cache_path, encoding='utf-8') as f:
+            return f.read()
+
+    print '- compressing %s' % src
+    minified = minifier(text)
+
+    try:
+        os.makedirs(os.path.dirname(cache_path))
+    except OSError:
+        pass
+
+    # Briefing pages render in several processes at once
+    tmp_path = '%s.%i.tmp' % (cache_path, os.getpid())
+
+    with codecs.open(tmp_path, 'w', encoding='utf-8') as f:
+        f.write(minified)
+
+    os.rename(tmp_path, cache_path)
+
+    return minified
+
 class Includer(object):
     """
     Base class for Javascript and CSS psuedo-template-tags.
@@ -58,23 +113,24 @@ class Includer(object):
     def render(self, path):
         if getattr(g, 'compile_includes', False):
             if path in g.compiled_includes:
-                timestamp_path = g.compiled_includes[path]
+                hashed_path = g.compiled_includes[path]
             else:
-                # Add a querystring to the rendered filename to prevent caching
-                timestamp_path = '%s?%i' % (path, int(time.time()))
+                content = self._compress().encode('utf-8')
+
+                # Name the file after its content, so it can be cached forever
+                hashed_path = get_hashed_path(path, content)
 
-                out_path = 'www/%s' % path
+                out_path = 'www/%s' % hashed_path
 
-                if path not in g.compiled_includes:
-                    print 'Rendering %s' % out_path
+                print 'Rendering %s' % out_path
 
-                    with codecs.open(out_path, 'w', encoding='utf-8') as f:
-                        f.write(self._compress())
+                with open(out_path, 'w') as f:
+                    f.write(content)
 
                 # See "fab render"
-                g.compiled_includes[path] = timestamp_path
+                g.compiled_includes[path] = hashed_path
 
-            markup = Markup(self.tag_string % self._relativize_path(timestamp_path))
+            markup = Markup(self.tag_string % self._relativize_path(hashed_path))
         else:
             response = ','.join(self.includes)
 
@@ -105,8 +161,7 @@ class JavascriptIncluder(Includer):
             src_paths.append('www/%s' % src)
 
             with codecs.open('www/%s' % src, encoding='utf-8') as f:
-                print '- compressing %s' % src
-                output.append(minify(f.read()))
+                output.append(cached_minify(minify, 'slimit', src, f.read()))
 
         context = make_context()
         context['paths'] = src_paths
@@ -140,8 +195,7 @@ class CSSIncluder(Includer):
                 src_paths.append('www/%s' % src)
 
             with codecs.open('www/%s' % src, encoding='utf-8') as f:
-                print '- compressing %s' % src
-                output.append(cssmin(f.read()))
+                output.append(cached_minify(cssmin, 'cssmin', src, f.read()))
 
         context = make_context()
         context['paths'] = src_paths
@@ -152,19 +206,93 @@ class CSSIncluder(Includer):
 
         return '\n'.join(output)
 
+def get_hashed_path(path, content):
+    """
+    Insert a hash of `content` before the extension of `path`, e.g.
+    js/app.min.js -> js/app.min.1a2b3c4d5e.js.
+    """
+    root, ext = os.path.splitext(path)
+
+    return '%s.%s%s' % (root, hashlib.md5(content).hexdigest()[:10], ext)
+
+def read_asset_manifest():
+    """
+    Get the compiled assets as of the last render, mapping each logical
+    path to its hashed path.
+    """
+    if not os.path.exists(ASSET_MANIFEST_PATH):
+        return {}
+
+    with open(ASSET_MANIFEST_PATH, 'r') as f:
+        return json.load(f)
+
+def write_asset_manifest(compiled_includes):
+    """
+    Record newly compiled assets, deleting the files they replace.
+    """
+    manifest = read_asset_manifest()
+
+    for path, hashed_path in compiled_includes.items():
+        old_path = manifest.get(path)
+
+        if old_path and old_path != hashed_path and os.path.exists('www/%s' % old_path):
+            os.remove('www/%s' % old_path)
+
+        manifest[path] = hashed_path
+
+    with open('%s.tmp' % ASSET_MANIFEST_PATH, 'w') as f:
+        json.dump(manifest, f, indent=4, sort_keys=True)
+
+    os.rename('%s.tmp' % ASSET_MANIFEST_PATH, ASSET_MANIFEST_PATH)
+
+    return manifest
+
+_config_cache = {}
+_copy_cache = {}
+
 def flatten_app_config():
     """
     Returns a copy of app_config containing only
     configuration variables.
+
+    The snapshot is cached per deployment target, since configure_targets
+    is the only supported way to change configuration at runtime.
     """
-    config = {}
+    target = app_config.DEPLOYMENT_TARGET
+
+    if target not in _config_cache:
+        config = {}
+
+        # Only all-caps [constant] vars get included
+        for k, v in app_config.__dict__.items():
+            if k.upper() == k:
+                config[k] = v
+
+        _config_cache.clear()
+        _config_cache[target] = config
+
+    return dict(_config_cache[target])
+
+def get_copy(path=None):
+    """
+    Get the parsed copytext spreadsheet, reparsing it only when the file
+    has changed since it was last read.
+    """
+    path = path or app_config.COPY_PATH
+
+    try:
+        mtime = os.path.getmtime(path)
+    except OSError:
+        # Let copytext report the missing file
+        return copytext.Copy(path)
+
+    cached = _copy_cache.get(path)
 
-    # Only all-caps [constant] vars get included
-    for k, v in app_config.__dict__.items():
-        if k.upper() == k:
-            config[k] = v
+    if not cached or cached[0] != mtime:
+        cached = (mtime, copytext.Copy(path))
+        _copy_cache[path] = cached
 
-    return config
+    return cached[1]
 
 def make_context(asset_depth=0):
     """
@@ -177,7 +305,7 @@ def make_context(asset_depth=0):
     """
     context = flatten_app_config()
 
-    context['COPY'] = copytext.Copy(app_config.COPY_PATH)
+    context['COPY'] = get_copy()
     context['JS'] = JavascriptIncluder(asset_depth=asset_depth)
     context['CSS'] = CSSIncluder(asset_depth=asset_depth)
 
@@ -0,0 +1,150 @@
+#!/usr/bin/env python
+
+"""
+Split briefing transcripts into speaker turns and count words by speaker.
+
+Transcripts mark each turn with the speaker's name in capitals ("MR.
+EARNEST:") or "Q" for a reporter's question. Turns are stored compactly
+as a flat list of token offsets and speaker ids into a per-briefing
+speaker table, rather than as copies of the text.
+"""
+
+import re
+
+import ngrams
+
+SECRETARY = 'secretary'
+REPORTERS = 'reporters'
+GUESTS = 'guests'
+ROLES = [SECRETARY, REPORTERS, GUESTS]
+
+# Speaker markers used by whoever is at the podium. Anyone else named in
+# capitals is a guest.
+PRESS_SECRETARIES = [
+    'MR. CARNEY',
+    'MR. EARNEST',
+    'THE PRESS SECRETARY'
+]
+
+# Transcripts pad markers with non-breaking spaces, which \s only matches
+# in unicode mode
+QUESTION_RE = re.compile(r'^Q(?:[\s:.]+|$)', re.UNICODE)
+SPEAKER_RE = re.compile(r"^((?:[A-Z][A-Z.'\-]*\s?){1,5}):\s*", re.UNICODE)
+
+# A single capitalized word before a colon ("OK: fine") is just a sentence,
+# so markers need a title or more than one word
+HONORIFICS = ('MR.', 'MS.', 'MRS.', 'DR.')
+
+def _match_speaker(line):
+    """
+    If `line` starts a new turn, return the speaker's name, role and the
+    rest of the line.
+    """
+    match = QUESTION_RE.match(line)
+
+    if match:
+        return 'Q', REPORTERS, line[match.end():]
+
+    match = SPEAKER_RE.match(line)
+
+    if match:
+        name = ' '.join(match.group(1).split())
+
+        if len(name.split()) < 2 and not name.startswith(HONORIFICS):
+            return None
+
+        role = SECRETARY if name in PRESS_SECRETARIES else GUESTS
+
+        return name, role, line[match.end():]
+
+    return None
+
+def iter_turns(text):
+    """
+    Yield (name, role, text) for each turn in a transcript.
+
+    Anything before the first marker (location, time) has no speaker and
+    is yielded with a name and role of None.
+    """
+    name = None
+    role = None
+    lines = []
+
+    for line in text.split('\n'):
+        line = line.strip()
+
+        if not line:
+            continue
+
+        speaker = _match_speaker(line)
+
+        if speaker:
+            if lines:
+                yield name, role, '\n'.join(lines)
+
+            name, role, line = speaker
+            lines = []
+
+        if line:
+            lines.append(line)
+
+    if lines:
+        yield name, role, '\n'.join(lines)
+
+def count_speakers(text, tokenize, n=3, min_count=1, top_n=0, stopwords=()):
+    """
+    Tokenize a transcript turn by turn, counting n-grams for the whole
+    briefing and for each role as it goes.
+
+    Returns the contents of a count file: overall and per-role counts, the
+    speaker table and the turns as [token offset, speaker id, ...]. If
+    `top_n` is set, `top` holds the most frequent n-grams of each order
+    (see `ngrams.top_counts`).
+    """
+    tokens = []
+    overall = ngrams.new_counts(n)
+
+    by_role = dict((role, ngrams.new_counts(n)) for role in ROLES)
+    role_tokens = dict((role, 0) for role in ROLES)
+
+    speakers = []
+    speaker_ids = {}
+    turns = []
+
+    for name, role, turn_text in iter_turns(text):
+        turn_tokens = tokenize(turn_text.lower())
+
+        if (name, role) not in speaker_ids:
+            speaker_ids[(name, role)] = len(speakers)
+            speakers.append([name, role])
+
+        offset = len(tokens)
+        turns.extend([offset, speaker_ids[(name, role)]])
+
+        tokens.extend(turn_tokens)
+        ngrams.update_ngrams(overall, tokens, offset)
+
+        # Per-role n-grams don't cross into the next speaker's turn
+        if role:
+            ngrams.update_ngrams(by_role[role], turn_tokens)
+            role_tokens[role] += len(turn_tokens)
+
+    overall = ngrams.prune(overall, min_count)
+
+    output = {
+        'count': len(tokens),
+        'ngrams': ngrams.encode(overall),
+        'speakers': speakers,
+        'turns': turns
+    }
+
+    if top_n:
+        output['top'] = ngrams.top_counts(overall, top_n, stopwords)
+
+    for role in ROLES:
+        output[role] = {
+            'count': role_tokens[role],
+            'ngrams': ngrams.encode(ngrams.prune(by_role[role], min_count))
+        }
+
+    return output
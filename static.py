@@ -1,25 +1,76 @@
 #!/usr/bin/env python
 
+from datetime import datetime
+import hashlib
 import json
 from mimetypes import guess_type
 import os
 import subprocess
+import threading
+import zlib
 
-from flask import abort, make_response
+from flask import Response, abort, make_response, request
+from werkzeug.http import is_resource_modified
+from werkzeug.wsgi import wrap_file
 
-import app_config
-import copytext
 from flask import Blueprint
-from render_utils import BetterJSONEncoder, flatten_app_config
+import precompress
+from render_utils import BetterJSONEncoder, flatten_app_config, get_copy
 
 static = Blueprint('static', __name__)
 
+# Static files are sent this many bytes at a time
+STATIC_CHUNK_SIZE = 64 * 1024
+
+# Compiled JST and LESS output, keyed by command
+_compiled = {}
+_compile_lock = threading.Lock()
+
+def _sources_signature(root):
+    """
+    Fingerprint every file under `root` by name and mtime.
+    """
+    stats = []
+
+    for dirpath, dirnames, filenames in os.walk(root):
+        for name in filenames:
+            path = os.path.join(dirpath, name)
+            stats.append((path, os.path.getmtime(path)))
+
+    return sorted(stats)
+
+def _compile(command, root):
+    """
+    Run a compiler, reusing its last output until a file under `root`
+    (including any imports) changes. Returns the output and its ETag.
+    """
+    signature = _sources_signature(root)
+    key = tuple(command)
+
+    with _compile_lock:
+        cached = _compiled.get(key)
+
+        if not cached or cached[0] != signature:
+            output = subprocess.check_output(command)
+            cached = (signature, output, hashlib.md5(output).hexdigest())
+            _compiled[key] = cached
+
+    return cached[1], cached[2]
+
+def _compiled_response(command, root, content_type):
+    output, etag = _compile(command, root)
+
+    response = make_response(output, 200, { 'Content-Type': content_type })
+    response.set_etag(etag)
+
+    return response.make_conditional(request)
+
 # Render JST templates on-demand
 @static.route('/js/templates.js')
 def _templates_js():
-    r = subprocess.check_output(["node_modules/universal-jst/bin/jst.js", "--template", "underscore", "jst"])
+    command = ["node_modules/universal-jst/bin/jst.js", "--template", "underscore", "jst"]
 
-    return make_response(r, 200, { 'Content-Type': 'application/javascript' })
+    return _compiled_response(command, 'jst', 'application/javascript')
 
 # Render LESS files on-demand
 @static.route('/less/<string:filename>')
@@ -27,9 +78,9 @@ def _less(filename):
     if not os.path.exists('less/%s' % filename):
         abort(404)
 
-    r = subprocess.check_output(["node_modules/less/bin/lessc", "less/%s" % filename])
+    command = ["node_modules/less/bin/lessc", "less/%s" % filename]
 
-    return make_response(r, 200, { 'Content-Type': 'text/css' })
+    return _compiled_response(command, 'less', 'text/css')
 
 # Render application configuration
 @static.route('/js/app_config.js')
@@ -42,15 +93,129 @@ def _app_config_js():
 # Render copytext
 @static.route('/js/copy.js')
 def _copy_js():
-    copy = 'window.COPY = ' + copytext.Copy(app_config.COPY_PATH).json()
+    copy = 'window.COPY = ' + get_copy().json()
 
     return make_response(copy, 200, { 'Content-Type': 'application/javascript' })
 
+def _precompressed(path):
+    """
+    Pick a current precompressed sibling of `path` the client accepts.
+    """
+    if not precompress.is_compressible(path):
+        return None, None
+
+    for encoding in precompress.encodings():
+        if request.accept_encodings[encoding]:
+            compressed_path = precompress.variant_path(path, encoding)
+
+            if compressed_path:
+                return compressed_path, encoding
+
+    return None, None
+
+def _byte_range(size, etag):
+    """
+    Get the [start, end) bytes asked for by a single-range Range header.
+
+    Returns None to send the whole file (no usable Range, or an If-Range
+    that no longer matches) and False if the range can't be satisfied.
+    """
+    byte_range = request.range
+
+    if not byte_range or byte_range.units != 'bytes' or len(byte_range.ranges) != 1:
+        return None
+
+    if_range = request.headers.get('If-Range')
+
+    if if_range and if_range.strip('"') != etag:
+        return None
+
+    start, end = byte_range.ranges[0]
+
+    # Suffix range, e.g. "bytes=-500"
+    if start < 0:
+        start = max(size + start, 0)
+        end = size
+    else:
+        end = size if end is None else min(end, size)
+
+    if start >= end:
+        return False
+
+    return start, end
+
+def _stream(path, start, end):
+    with open(path, 'rb') as f:
+        f.seek(start)
+        remaining = end - start
+
+        while remaining > 0:
+            chunk = f.read(min(STATIC_CHUNK_SIZE, remaining))
+
+            if not chunk:
+                break
+
+            remaining -= len(chunk)
+
+            yield chunk
+
 # Server arbitrary static files on-demand
 @static.route('/<path:path>')
 def _static(path):
+    path = 'www/%s' % path
+    headers = { 'Accept-Ranges': 'bytes' }
+
+    if precompress.is_compressible(path):
+        headers['Vary'] = 'Accept-Encoding'
+
+    content_type = guess_type(path)[0]
+
+    # Ranges are in bytes of the file as stored, so keep them uncompressed
+    if 'Range' not in request.headers:
+        compressed_path, encoding = _precompressed(path)
+
+        if compressed_path:
+            path = compressed_path
+            headers['Content-Encoding'] = encoding
+
     try:
-        with open('www/%s' % path) as f:
-            return make_response(f.read(), 200, { 'Content-Type': guess_type(path)[0] })
-    except IOError:
+        stat = os.stat(path)
+    except OSError:
+        abort(404)
+
+    if not os.path.isfile(path):
         abort(404)
+
+    etag = '%x-%x-%x' % (int(stat.st_mtime * 1000), stat.st_size, zlib.adler32(path) & 0xffffffff)
+    last_modified = datetime.utcfromtimestamp(int(stat.st_mtime))
+
+    if not is_resource_modified(request.environ, etag, last_modified=last_modified):
+        response = Response(status=304, headers=headers)
+        response.set_etag(etag)
+
+        return response
+
+    byte_range = _byte_range(stat.st_size, etag)
+
+    if byte_range is False:
+        headers['Content-Range'] = 'bytes */%i' % stat.st_size
+
+        return Response(status=416, headers=headers)
+
+    if byte_range:
+        start, end = byte_range
+
+        headers['Content-Range'] = 'bytes %i-%i/%i' % (start, end - 1, stat.st_size)
+        response = Response(_stream(path, start, end), 206, headers, content_type=content_type, direct_passthrough=True)
+    else:
+        start, end = 0, stat.st_size
+
+        # Lets the server use sendfile, where it can
+        body = wrap_file(request.environ, open(path, 'rb'), STATIC_CHUNK_SIZE)
+        response = Response(body, 200, headers, content_type=content_type, direct_passthrough=True)
+
+    response.content_length = end - start
+    response.last_modified = last_modified
+    response.set_etag(etag)
+
+    return response
@@ -0,0 +1,149 @@
+#!/usr/bin/env python
+
+"""
+Dense term-by-week and term-by-briefing count matrices.
+
+Counts are stored as plain .npy files so they can be memory-mapped, with
+the term vocabulary and column labels alongside in JSON. Weeks are
+contiguous (every Sunday from the first briefing to the last), so a date
+range is a single column slice.
+"""
+
+from bisect import bisect_left
+from datetime import datetime, timedelta
+import json
+import os
+
+import numpy
+
+import ngrams
+
+MATRIX_DIR = 'data/text/matrix'
+INDEX_FILENAME = 'index.json'
+BY_WEEK_FILENAME = 'by_week.npy'
+BY_BRIEFING_FILENAME = 'by_briefing.npy'
+
+def week_of(d):
+    """
+    Get the Sunday that starts the week containing `d`.
+    """
+    return d - timedelta(days=(d.weekday() + 1) % 7)
+
+def _save(path, array):
+    with open('%s.tmp' % path, 'wb') as f:
+        numpy.save(f, array)
+
+    os.rename('%s.tmp' % path, path)
+
+def build_matrix(paths, extra_terms=(), matrix_dir=MATRIX_DIR):
+    """
+    Build the matrices from count files.
+
+    The vocabulary is every unigram in the corpus plus `extra_terms`, which
+    is how longer n-grams such as search terms get a row.
+    """
+    briefings = []
+    vocab = set(extra_terms)
+
+    for path in paths:
+        filename = os.path.split(path)[1]
+        slug = os.path.splitext(filename)[0]
+
+        with open(path, 'r') as f:
+            words = ngrams.read_counts(json.load(f))['words']
+
+        column = dict((word, count) for word, count in words.iteritems() if ' ' not in word)
+
+        for term in extra_terms:
+            if term in words:
+                column[term] = words[term]
+
+        vocab.update(column)
+        # Count files are named by slug, which starts with the date
+        d = datetime.strptime('-'.join(slug.split('-')[:3]), '%m-%d-%y')
+        briefings.append((d, slug, column))
+
+    briefings.sort()
+
+    terms = sorted(vocab)
+    term_ids = dict((term, i) for i, term in enumerate(terms))
+
+    by_briefing = numpy.zeros((len(terms), len(briefings)), dtype=numpy.int32)
+
+    for j, (d, slug, column) in enumerate(briefings):
+        rows = [term_ids[term] for term in column]
+        by_briefing[rows, j] = column.values()
+
+    if briefings:
+        first_week = week_of(briefings[0][0])
+        week_count = (week_of(briefings[-1][0]) - first_week).days / 7 + 1
+    else:
+        first_week = None
+        week_count = 0
+
+    weeks = [(first_week + timedelta(days=7 * i)).strftime('%Y-%m-%d') for i in range(0, week_count)]
+
+    by_week = numpy.zeros((len(terms), week_count), dtype=numpy.int32)
+
+    for j, (d, slug, column) in enumerate(briefings):
+        by_week[:, (week_of(d) - first_week).days / 7] += by_briefing[:, j]
+
+    if not os.path.exists(matrix_dir):
+        os.makedirs(matrix_dir)
+
+    _save(os.path.join(matrix_dir, BY_BRIEFING_FILENAME), by_briefing)
+    _save(os.path.join(matrix_dir, BY_WEEK_FILENAME), by_week)
+
+    index_path = os.path.join(matrix_dir, INDEX_FILENAME)
+
+    with open('%s.tmp' % index_path, 'w') as f:
+        json.dump({
+            'terms': terms,
+            'weeks': weeks,
+            'briefings': [slug for d, slug, column in briefings]
+        }, f)
+
+    os.rename('%s.tmp' % index_path, index_path)
+
+    return by_week.shape
+
+class TermMatrix(object):
+    """
+    Memory-mapped view of the built matrices.
+    """
+    def __init__(self, matrix_dir=MATRIX_DIR):
+        with open(os.path.join(matrix_dir, INDEX_FILENAME), 'r') as f:
+            index = json.load(f)
+
+        self.terms = index['terms']
+        self.weeks = index['weeks']
+        self.briefings = index['briefings']
+        self.term_ids = dict((term, i) for i, term in enumerate(self.terms))
+
+        self.by_week = numpy.load(os.path.join(matrix_dir, BY_WEEK_FILENAME), mmap_mode='r')
+        self.by_briefing = numpy.load(os.path.join(matrix_dir, BY_BRIEFING_FILENAME), mmap_mode='r')
+
+    def _rows(self, terms):
+        return [self.term_ids[term] for term in terms if term in self.term_ids]
+
+    def week_counts(self, terms, start=None, end=None):
+        """
+        Sum weekly counts for `terms` (e.g. a set of synonyms).
+
+        `start` and `end` are YYYY-MM-DD strings bounding the weeks returned
+        (end is exclusive). Returns the week labels and an array of counts.
+        """
+        first = bisect_left(self.weeks, start) if start else 0
+        last = bisect_left(self.weeks, end) if end else len(self.weeks)
+
+        rows = self._rows(terms)
+        counts = self.by_week[rows, first:last].sum(axis=0)
+
+        return self.weeks[first:last], counts
+
+    def briefing_counts(self, terms):
+        """
+        Sum per-briefing counts for `terms`, in date order. Briefings are
+        labelled by slug.
+        """
+        return self.briefings, self.by_briefing[self._rows(terms), :].sum(axis=0)
@@ -19,6 +19,22 @@ class IndexTestCase(unittest.TestCase):
 
         assert app_config.PROJECT_SLUG in response.data
 
+class CacheStatsTestCase(unittest.TestCase):
+    """
+    Test the cache debug endpoint.
+    """
+    def setUp(self):
+        app.app.config['TESTING'] = True
+        self.client = app.app.test_client()
+
+    def test_cache_stats(self):
+        response = self.client.get('/debug/cache.json')
+
+        data = json.loads(response.data)
+
+        assert 'hits' in data['json']
+        assert 'misses' in data['json']
+
 class AppConfigTestCase(unittest.TestCase):
     """
     Testing dynamic conversion of Python app_config into Javascript. 
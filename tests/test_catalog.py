@@ -0,0 +1,87 @@
+#!/usr/bin/env python
+
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+import catalog
+
+class CatalogTestCase(unittest.TestCase):
+    """
+    Test building and paging through the briefing catalog.
+    """
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.catalog_path = os.path.join(self.tmp, 'catalog.json')
+        self.paths = []
+
+        for i, slug in enumerate(['12-08-14-press-briefing', '12-03-14-press-briefing', '01-05-15-press-briefing']):
+            path = os.path.join(self.tmp, '%s.txt' % slug)
+            self.paths.append(path)
+
+            with open(self.count_path(path), 'w') as f:
+                json.dump({
+                    'count': 100 + i,
+                    'speakers': [['MR. EARNEST', 'secretary'], ['Q', 'reporters']],
+                    'turns': [0, 0, 40, 1, 60, 0],
+                    'secretary': { 'count': 80 },
+                    'reporters': { 'count': 20 + i }
+                }, f)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp)
+
+    def count_path(self, path):
+        return '%s.json' % os.path.splitext(path)[0]
+
+    def build(self, sources={}):
+        return catalog.build_catalog(self.paths, self.count_path, sources, self.catalog_path)
+
+    def test_build(self):
+        sources = {
+            '12-08-14-press-briefing': {
+                'title': 'Press Briefing, 12/8/14',
+                'transcript_url': '/the-press-office/2014/12/08/press-briefing'
+            }
+        }
+
+        assert self.build(sources) == 3
+
+        briefings = catalog.Catalog(self.catalog_path).briefings
+
+        assert [b['date'] for b in briefings] == ['2015-01-05', '2014-12-08', '2014-12-03']
+        assert briefings[1]['title'] == 'Press Briefing, 12/8/14'
+        assert briefings[1]['url'] == '/the-press-office/2014/12/08/press-briefing'
+        assert briefings[1]['count'] == 100
+        assert briefings[1]['turns'] == 3
+        assert briefings[1]['speakers'] == 2
+        assert briefings[1]['secretary_count'] == 80
+        assert briefings[1]['guests_count'] == 0
+
+    def test_skips_uncounted(self):
+        os.remove(self.count_path(self.paths[0]))
+
+        assert self.build() == 2
+
+    def test_pages(self):
+        self.build()
+
+        loaded = catalog.Catalog(self.catalog_path)
+
+        assert loaded.page_count(per_page=2) == 2
+        assert [b['slug'] for b in loaded.page(2, per_page=2)] == ['12-03-14-press-briefing']
+
+    def test_missing(self):
+        loaded = catalog.load(self.catalog_path)
+
+        assert loaded.briefings == []
+        assert loaded.page_count() == 1
+
+        self.build()
+
+        assert len(catalog.load(self.catalog_path).briefings) == 3
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,134 @@
+#!/usr/bin/env python
+
+import os
+import shutil
+import tempfile
+import unittest
+
+import corpus
+
+class CorpusTestCase(unittest.TestCase):
+    """
+    Test storing briefings and querying terms over time.
+    """
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.corpus = corpus.Corpus(os.path.join(self.tmp, 'corpus.db'))
+
+        # 2014-12-08 is a Monday, 2014-12-13 a Saturday in the same week,
+        # 2014-12-22 two weeks later
+        self.corpus.store_briefing('12-08-14-press-briefing', '2014-12-08', u'MR. EARNEST: Ebola.', {
+            'count': 150,
+            'words': { 'ebola': 3, 'isis': 1, 'health care': 2 },
+            'speakers': [['MR. EARNEST', 'secretary'], ['Q', 'reporters']],
+            'turns': [0, 0, 100, 1],
+            'secretary': { 'count': 100, 'words': { 'ebola': 2 } },
+            'reporters': { 'count': 40, 'words': { 'ebola': 1, 'isis': 1 } }
+        }, 'Press Briefing, 12/8/14', '/the-press-office/2014/12/08/press-briefing')
+
+        self.corpus.store_briefing('12-13-14-press-briefing', '2014-12-13', u'', {
+            'count': 5,
+            'words': { 'ebola': 1, 'isil': 4 }
+        })
+
+        self.corpus.store_briefing('12-22-14-press-briefing', '2014-12-22', u'', {
+            'count': 2,
+            'words': { 'isis': 2 }
+        })
+
+        self.corpus.update_weeks()
+
+    def tearDown(self):
+        self.corpus.close()
+        shutil.rmtree(self.tmp)
+
+    def test_term_counts(self):
+        ebola = self.corpus.term_counts('ebola')
+
+        assert sorted(ebola.keys()) == ['12-08-14-press-briefing', '12-13-14-press-briefing']
+        assert ebola['12-08-14-press-briefing'] == { 'date': '2014-12-08', 'count': 3, 'secretary': 2, 'reporter': 1 }
+        assert ebola['12-13-14-press-briefing'] == { 'date': '2014-12-13', 'count': 1, 'secretary': 0, 'reporter': 0 }
+        assert self.corpus.term_counts('health care')['12-08-14-press-briefing']['count'] == 2
+
+    def test_same_date(self):
+        self.corpus.store_briefing('12-13-14-press-gaggle', '2014-12-13', u'', {
+            'count': 3,
+            'words': { 'ebola': 2 }
+        })
+        self.corpus.update_weeks()
+
+        ebola = self.corpus.term_counts('ebola')
+
+        assert ebola['12-13-14-press-briefing']['count'] == 1
+        assert ebola['12-13-14-press-gaggle']['count'] == 2
+        assert self.corpus.week_counts(['ebola']) == { '2014-12-07': 6 }
+        assert len(self.corpus.briefing_totals()) == 4
+
+    def test_missing_term(self):
+        assert self.corpus.term_counts('benghazi') == {}
+        assert self.corpus.week_counts(['benghazi']) == {}
+
+    def test_briefing_totals(self):
+        totals = self.corpus.briefing_totals()
+
+        assert totals['12-08-14-press-briefing'] == { 'date': '2014-12-08', 'secretary_count': 100, 'reporter_count': 40 }
+        assert totals['12-13-14-press-briefing'] == { 'date': '2014-12-13', 'secretary_count': 0, 'reporter_count': 0 }
+
+    def test_week_counts(self):
+        assert self.corpus.week_counts(['ebola']) == { '2014-12-07': 4 }
+
+    def test_synonyms_sum(self):
+        counts = self.corpus.week_counts(['isis', 'isil', 'islamic state'])
+
+        assert counts == { '2014-12-07': 5, '2014-12-21': 2 }
+
+    def test_no_terms(self):
+        assert self.corpus.week_counts([]) == {}
+
+    def test_week_range(self):
+        assert self.corpus.week_counts(['isis'], '2014-12-14', '2015-01-01') == { '2014-12-21': 2 }
+
+    def test_replace_briefing(self):
+        self.corpus.store_briefing('12-22-14-press-briefing', '2014-12-22', u'', {
+            'count': 1,
+            'words': { 'ukraine': 1 }
+        })
+        self.corpus.update_weeks()
+
+        assert self.corpus.week_counts(['isis']) == { '2014-12-07': 1 }
+        assert self.corpus.term_counts('ukraine').keys() == ['12-22-14-press-briefing']
+
+    def test_remove_briefing(self):
+        assert self.corpus.remove_briefing('12-13-14-press-briefing')
+        assert not self.corpus.remove_briefing('12-13-14-press-briefing')
+
+        self.corpus.update_weeks()
+
+        assert self.corpus.week_counts(['ebola']) == { '2014-12-07': 3 }
+        assert sorted(self.corpus.slugs()) == ['12-08-14-press-briefing', '12-22-14-press-briefing']
+
+    def test_only_stale_weeks_updated(self):
+        assert self.corpus.update_weeks() == 0
+
+        self.corpus.store_briefing('12-23-14-press-briefing', '2014-12-23', u'', {
+            'count': 1,
+            'words': { 'isis': 1 }
+        })
+
+        assert self.corpus.update_weeks() == 1
+        assert self.corpus.week_counts(['isis']) == { '2014-12-07': 1, '2014-12-21': 3 }
+
+    def test_briefing_count(self):
+        assert self.corpus.briefing_count() == 3
+
+    def test_turns(self):
+        rows = self.corpus.db.execute(
+            '''SELECT turns.token_offset, speakers.name FROM turns
+                JOIN speakers ON speakers.briefing_id = turns.briefing_id AND speakers.speaker_id = turns.speaker_id
+                ORDER BY turns.position'''
+        ).fetchall()
+
+        assert rows == [(0, 'MR. EARNEST'), (100, 'Q')]
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,75 @@
+#!/usr/bin/env python
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from count_cache import LRUCache
+
+class LRUCacheTestCase(unittest.TestCase):
+    """
+    Test the parsed file cache.
+    """
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.loads = []
+
+        def loader(path):
+            self.loads.append(path)
+
+            with open(path) as f:
+                return f.read()
+
+        self.cache = LRUCache(loader, max_entries=2)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp)
+
+    def write(self, name, contents, mtime=1000000000):
+        path = os.path.join(self.tmp, name)
+
+        with open(path, 'w') as f:
+            f.write(contents)
+
+        os.utime(path, (mtime, mtime))
+
+        return path
+
+    def test_hits_and_misses(self):
+        path = self.write('a.json', 'a')
+
+        assert self.cache.get(path) == 'a'
+        assert self.cache.get(path) == 'a'
+        assert self.loads == [path]
+        assert self.cache.stats()['hits'] == 1
+        assert self.cache.stats()['misses'] == 1
+
+    def test_reload_on_mtime_change(self):
+        path = self.write('a.json', 'a')
+        self.cache.get(path)
+
+        self.write('a.json', 'b', mtime=1000000100)
+
+        assert self.cache.get(path) == 'b'
+        assert len(self.loads) == 2
+
+    def test_lru_eviction(self):
+        a = self.write('a.json', 'a')
+        b = self.write('b.json', 'b')
+        c = self.write('c.json', 'c')
+
+        self.cache.get(a)
+        self.cache.get(b)
+        self.cache.get(a)
+        self.cache.get(c)
+
+        # b was least recently used
+        self.cache.get(a)
+        self.cache.get(b)
+
+        assert self.loads == [a, b, c, b]
+        assert self.cache.stats()['evictions'] == 2
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,322 @@
+#!/usr/bin/env python
+
+import os
+import shutil
+from StringIO import StringIO
+import sys
+import tempfile
+import unittest
+
+from fabfile import data
+
+FIXTURES_PATH = os.path.join(os.path.dirname(__file__), 'fixtures', 'whitehouse')
+
+def read_fixture(path):
+    with open(os.path.join(FIXTURES_PATH, path), 'rb') as f:
+        return f.read()
+
+class ParseListingTestCase(unittest.TestCase):
+    """
+    Test parsing briefing listing pages.
+    """
+    def test_parse_listing(self):
+        rows = data.parse_listing(read_fixture('briefing-room/press-briefings.html'))
+
+        assert len(rows) == 2
+        assert rows[0]['date'] == 'December 08, 2014'
+        assert rows[0]['title'].startswith('Press Briefing')
+        assert rows[0]['transcript_url'] == '/the-press-office/2014/12/08/press-briefing-press-secretary-josh-earnest-12814'
+
+class FakeFetcher(object):
+    """
+    Serve the fixture listing for every page, recording what was fetched.
+    """
+    def __init__(self, workers=4):
+        self.workers = workers
+        self.batches = []
+
+    def fetch_all(self, urls, refresh=False):
+        self.batches.append((urls, refresh))
+
+        for url in urls:
+            yield read_fixture('briefing-room/press-briefings.html')
+
+class ScrapeLinksTestCase(unittest.TestCase):
+    """
+    Test paging through listings until links from the last run are reached.
+    """
+    def setUp(self):
+        self.fetcher = data.fetcher
+        data.fetcher = FakeFetcher()
+
+        self.rows = data.parse_listing(read_fixture('briefing-room/press-briefings.html'))
+        self.briefings = [row for row in self.rows if row['title'].startswith('Press Briefing')]
+
+    def tearDown(self):
+        data.fetcher = self.fetcher
+
+    def test_first_page_alone(self):
+        links = data.scrape_links(known_urls=set([self.rows[1]['transcript_url']]))
+
+        assert data.fetcher.batches == [(['%s?page=0' % data.ROOT_URL], True)]
+        assert links == self.briefings
+
+    def test_full_scrape(self):
+        links = data.scrape_links()
+        batches = [urls for urls, refresh in data.fetcher.batches]
+
+        assert [len(urls) for urls in batches] == [1, 4, 4, 4, 4, 4, 1]
+        assert sum(batches, []) == ['%s?page=%i' % (data.ROOT_URL, index) for index in range(data.LISTING_PAGES)]
+        assert len(links) == data.LISTING_PAGES * len(self.briefings)
+
+    def test_briefings_only(self):
+        links = data.scrape_links(known_urls=set([self.rows[1]['transcript_url']]))
+
+        assert len(self.briefings) < len(self.rows)
+        assert all(row['title'].startswith('Press Briefing') for row in links)
+        assert self.rows[1]['transcript_url'] not in [row['transcript_url'] for row in links]
+
+    def test_reached_mark(self):
+        row = { 'date': 'December 08, 2014', 'transcript_url': '/a' }
+
+        assert not data._reached_mark(row, None, set())
+        assert data._reached_mark(row, None, set(['/a']))
+        assert data._reached_mark(row, { 'date': 'December 08, 2014', 'transcript_url': '/a' }, set())
+        assert data._reached_mark(row, { 'date': 'December 09, 2014', 'transcript_url': '/b' }, set())
+        assert not data._reached_mark(row, { 'date': 'December 08, 2014', 'transcript_url': '/b' }, set())
+        assert not data._reached_mark(row, { 'date': 'December 05, 2014', 'transcript_url': '/b' }, set())
+
+    def test_dedupe_links(self):
+        rows = [
+            { 'date': 'December 09, 2014', 'transcript_url': '/b' },
+            { 'date': 'December 08, 2014', 'transcript_url': '/a' },
+            { 'date': 'December 08, 2014 (updated)', 'transcript_url': '/a' }
+        ]
+
+        assert data._dedupe_links(rows) == rows[:2]
+
+class LinksFileTestCase(unittest.TestCase):
+    """
+    Test reading and writing the links CSV and scrape state.
+    """
+    def setUp(self):
+        self.cwd = os.getcwd()
+        self.tmp = tempfile.mkdtemp()
+
+        os.chdir(self.tmp)
+        os.mkdir('data')
+
+        self.rows = [
+            { 'date': 'December 09, 2014', 'title': u'Press Briefing, Caf\xe9', 'transcript_url': '/b' },
+            { 'date': 'December 08, 2014', 'title': 'Press Briefing', 'transcript_url': '/a' }
+        ]
+
+    def tearDown(self):
+        os.chdir(self.cwd)
+        shutil.rmtree(self.tmp)
+
+    def test_missing(self):
+        assert data.read_links() == []
+        assert data.read_scrape_state() is None
+
+    def test_round_trip(self):
+        data.write_links(self.rows)
+
+        assert data.read_links() == self.rows
+        assert not os.path.exists('data/%s.tmp' % data.CSV_PATH)
+
+        with open('data/%s' % data.CSV_PATH, 'rb') as f:
+            assert f.readline().strip() == 'date,title,transcript_url'
+
+    def test_stray_headers(self):
+        # Older scrapes appended a header row on every run
+        with open('data/%s' % data.CSV_PATH, 'wb') as f:
+            f.write('date,title,transcript_url\r\n')
+            f.write('"December 09, 2014",Press Briefing,/b\r\n')
+            f.write('date,title,transcript_url\r\n')
+            f.write('"December 08, 2014",Press Briefing,/a\r\n')
+
+        assert [row['transcript_url'] for row in data.read_links()] == ['/b', '/a']
+
+    def test_scrape_state(self):
+        data.write_scrape_state(self.rows[0])
+
+        assert data.read_scrape_state() == { 'date': 'December 09, 2014', 'transcript_url': '/b' }
+
+class AnalyzeTranscriptsTestCase(unittest.TestCase):
+    """
+    Test that only new or changed transcripts are recounted.
+    """
+    def setUp(self):
+        self.cwd = os.getcwd()
+        self.tmp = tempfile.mkdtemp()
+
+        os.chdir(self.tmp)
+        os.makedirs('data/text')
+
+        self.word_tokenize = data.nltk.word_tokenize
+        self.filter_stopwords = data.FILTER_STOPWORDS
+        self.analyzer_version = data.ANALYZER_VERSION
+        self.count_words = data._count_words
+
+        data.nltk.word_tokenize = lambda text: text.split()
+        data.FILTER_STOPWORDS = False
+
+        self.counted = []
+
+        def count_words(path):
+            self.counted.append(path)
+            self.count_words(path)
+
+        data._count_words = count_words
+
+        self.write('12-08-14-press-briefing', 'MR. EARNEST: Good afternoon.\nQ Ebola?')
+        self.write('12-09-14-press-briefing', 'MR. EARNEST: Ebola again.')
+
+    def tearDown(self):
+        data.nltk.word_tokenize = self.word_tokenize
+        data.FILTER_STOPWORDS = self.filter_stopwords
+        data.ANALYZER_VERSION = self.analyzer_version
+        data._count_words = self.count_words
+
+        os.chdir(self.cwd)
+        shutil.rmtree(self.tmp)
+
+    def write(self, slug, text):
+        with open('data/text/%s.txt' % slug, 'w') as f:
+            f.write(text)
+
+    def analyze(self):
+        self.counted = []
+        data.analyze_transcripts(jobs=1)
+
+        return self.counted
+
+    def test_unchanged_skipped(self):
+        assert self.analyze() == ['data/text/12-08-14-press-briefing.txt', 'data/text/12-09-14-press-briefing.txt']
+        assert os.path.exists('data/text/counts/12-08-14-press-briefing.json')
+        assert os.path.exists('data/text/top/12-08-14-press-briefing.json')
+
+        assert self.analyze() == []
+
+    def test_changed_recounted(self):
+        self.analyze()
+        self.write('12-09-14-press-briefing', 'MR. EARNEST: Ukraine.')
+
+        assert self.analyze() == ['data/text/12-09-14-press-briefing.txt']
+
+        with open('data/text/counts/12-09-14-press-briefing.json') as f:
+            assert 'ukraine' in f.read()
+
+    def test_version_bump(self):
+        self.analyze()
+        data.ANALYZER_VERSION += 1
+
+        assert len(self.analyze()) == 2
+
+    def test_deleted_transcript(self):
+        self.analyze()
+        os.remove('data/text/12-08-14-press-briefing.txt')
+
+        assert self.analyze() == []
+        assert not os.path.exists('data/text/counts/12-08-14-press-briefing.json')
+        assert not os.path.exists('data/text/top/12-08-14-press-briefing.json')
+        assert os.path.exists('data/text/counts/12-09-14-press-briefing.json')
+
+        with open(data.ANALYSIS_MANIFEST_PATH) as f:
+            assert 'data/text/12-08-14-press-briefing.txt' not in f.read()
+
+    def test_failures_in_pool(self):
+        self.write('12-10-14-press-briefing', 'MR. EARNEST: Ukraine.')
+
+        count_words = self.count_words
+
+        # Workers are forked, so they inherit this patch
+        def fail_one(path):
+            if path == 'data/text/12-09-14-press-briefing.txt':
+                raise ValueError('unparseable transcript')
+
+            count_words(path)
+
+        data._count_words = fail_one
+
+        stdout = sys.stdout
+        sys.stdout = StringIO()
+
+        try:
+            data.analyze_transcripts(jobs=2)
+            output = sys.stdout.getvalue()
+        finally:
+            sys.stdout = stdout
+
+        assert os.path.exists('data/text/counts/12-08-14-press-briefing.json')
+        assert os.path.exists('data/text/counts/12-10-14-press-briefing.json')
+        assert not os.path.exists('data/text/counts/12-09-14-press-briefing.json')
+
+        manifest = data._read_analysis_manifest()
+
+        assert sorted(manifest.keys()) == ['data/text/12-08-14-press-briefing.txt', 'data/text/12-10-14-press-briefing.txt']
+        assert 'unparseable transcript' in output
+        assert sorted(data.corpus.load().slugs()) == ['12-08-14-press-briefing', '12-10-14-press-briefing']
+
+        # Results are reported in input order, however the workers finish
+        lines = [line for line in output.split('\n') if line.startswith('data/text/') and line.endswith('.txt')]
+
+        assert lines == [
+            'data/text/12-08-14-press-briefing.txt',
+            'data/text/12-09-14-press-briefing.txt',
+            'data/text/12-10-14-press-briefing.txt'
+        ]
+
+    def test_corpus_caught_up(self):
+        self.analyze()
+
+        store = data.corpus.load()
+        store.remove_briefing('12-08-14-press-briefing')
+
+        assert self.analyze() == []
+        assert sorted(store.slugs()) == ['12-08-14-press-briefing', '12-09-14-press-briefing']
+
+    def test_failed_corpus_update(self):
+        store_briefing = data._store_briefing
+
+        def fail(store, path, sources):
+            raise IOError('disk full')
+
+        data._store_briefing = fail
+
+        try:
+            self.assertRaises(IOError, self.analyze)
+        finally:
+            data._store_briefing = store_briefing
+
+        assert not os.path.exists(data.ANALYSIS_MANIFEST_PATH)
+
+        self.analyze()
+
+        assert data.corpus.load().briefing_count() == 2
+
+class IterParagraphsTestCase(unittest.TestCase):
+    """
+    Test streaming paragraphs out of transcript pages.
+    """
+    def test_paragraphs(self):
+        response = read_fixture('the-press-office/2014/12/08/press-briefing-press-secretary-josh-earnest-12814.html')
+        paragraphs = list(data.iter_paragraphs(response))
+
+        assert len(paragraphs) == 6
+        assert paragraphs[0] == 'James S. Brady Press Briefing Room'
+        assert paragraphs[3] == 'Q Thanks, Josh. Can you give us an update on Ebola?'
+
+    def test_div_fallback(self):
+        response = '<html><body><div id="content"><div>MR. EARNEST: Hi.</div><div>Q <b>Josh</b>?</div></div><p>Footer</p></body></html>'
+
+        assert list(data.iter_paragraphs(response)) == ['MR. EARNEST: Hi.', 'Q Josh?']
+
+    def test_paragraphs_win_over_divs(self):
+        response = '<html><body><div id="content"><div>Share</div><p>MR. EARNEST: Hi.</p></div></body></html>'
+
+        assert list(data.iter_paragraphs(response)) == ['MR. EARNEST: Hi.']
+
+if __name__ == '__main__':
+    unittest.main()
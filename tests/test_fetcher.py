@@ -0,0 +1,127 @@
+#!/usr/bin/env python
+
+from BaseHTTPServer import BaseHTTPRequestHandler, HTTPServer
+import os
+import shutil
+import tempfile
+import threading
+import time
+import unittest
+
+from fetcher import Fetcher, RateLimiter
+
+FIXTURES_PATH = os.path.join(os.path.dirname(__file__), 'fixtures', 'whitehouse')
+
+class WhitehouseHandler(BaseHTTPRequestHandler):
+    """
+    Serve recorded whitehouse.gov pages from the fixtures directory.
+    """
+    def do_GET(self):
+        self.server.hits.append(self.path)
+
+        path = '%s.html' % os.path.join(FIXTURES_PATH, self.path.split('?')[0].strip('/'))
+
+        if not os.path.exists(path):
+            self.send_response(404)
+            self.end_headers()
+            return
+
+        with open(path, 'rb') as f:
+            body = f.read()
+
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/html; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+class FetcherTestCase(unittest.TestCase):
+    """
+    Test fetching pages from a local stand-in for whitehouse.gov.
+    """
+    def setUp(self):
+        self.server = HTTPServer(('127.0.0.1', 0), WhitehouseHandler)
+        self.server.hits = []
+        self.root = 'http://127.0.0.1:%i' % self.server.server_port
+
+        self.thread = threading.Thread(target=self.server.serve_forever)
+        self.thread.daemon = True
+        self.thread.start()
+
+        self.cache_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+        shutil.rmtree(self.cache_dir)
+
+    def test_fetch_all_preserves_order(self):
+        fetcher = Fetcher(workers=4, requests_per_minute=0, cache_dir=self.cache_dir)
+
+        urls = [
+            '%s/briefing-room/press-briefings?page=%i' % (self.root, i) for i in range(0, 5)
+        ] + [
+            '%s/the-press-office/2014/12/08/press-briefing-press-secretary-josh-earnest-12814' % self.root
+        ]
+
+        responses = list(fetcher.fetch_all(urls))
+
+        assert len(responses) == 6
+        assert all('entry-list' in r for r in responses[:5])
+        assert 'MR. EARNEST' in responses[5]
+
+    def test_cache_hits_skip_throttle(self):
+        url = '%s/briefing-room/press-briefings' % self.root
+
+        Fetcher(workers=1, requests_per_minute=0, cache_dir=self.cache_dir).fetch(url)
+
+        # One request a minute: a real fetch would block
+        fetcher = Fetcher(workers=4, requests_per_minute=1, cache_dir=self.cache_dir)
+
+        start = time.time()
+        responses = list(fetcher.fetch_all([url] * 4))
+
+        assert time.time() - start < 1
+        assert len(responses) == 4
+        assert len([h for h in self.server.hits if h != '/robots.txt']) == 1
+
+    def test_refresh_bypasses_cache(self):
+        url = '%s/briefing-room/press-briefings' % self.root
+
+        fetcher = Fetcher(workers=2, requests_per_minute=0, cache_dir=self.cache_dir)
+
+        fetcher.fetch(url)
+        fetcher.fetch(url)
+        fetcher.fetch(url, refresh=True)
+
+        assert len([h for h in self.server.hits if h != '/robots.txt']) == 2
+
+class RateLimiterTestCase(unittest.TestCase):
+    """
+    Test per-host request spacing.
+    """
+    def test_spacing(self):
+        limiter = RateLimiter(requests_per_minute=600)
+
+        start = time.time()
+
+        for i in range(0, 3):
+            limiter.wait('www.whitehouse.gov')
+
+        assert time.time() - start >= 0.2
+
+    def test_hosts_are_independent(self):
+        limiter = RateLimiter(requests_per_minute=1)
+
+        start = time.time()
+
+        limiter.wait('www.whitehouse.gov')
+        limiter.wait('example.com')
+
+        assert time.time() - start < 1
+
+if __name__ == '__main__':
+    unittest.main()
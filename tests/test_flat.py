@@ -0,0 +1,127 @@
+#!/usr/bin/env python
+
+import gzip
+import os
+import shutil
+from StringIO import StringIO
+import tempfile
+import unittest
+
+import boto
+from moto import mock_s3
+
+import app_config
+from fabfile import flat
+import precompress
+
+class DeployFolderTestCase(unittest.TestCase):
+    """
+    Test deploying a folder against a mocked S3.
+    """
+    def setUp(self):
+        self.mock = mock_s3()
+        self.mock.start()
+
+        app_config.configure_targets('staging')
+
+        s3 = boto.connect_s3()
+        self.bucket = s3.create_bucket(app_config.S3_BUCKET['bucket_name'])
+
+        self.tmp = tempfile.mkdtemp()
+
+        self.manifest_path = flat.DEPLOY_MANIFEST_PATH
+        flat.DEPLOY_MANIFEST_PATH = os.path.join(self.tmp, '.deploy_manifest.json')
+
+        os.makedirs(os.path.join(self.tmp, 'js'))
+
+        self.write('index.html', '<html>Briefings</html>')
+        self.write('js/app.js', 'var briefings = [];')
+        self.write('image.png', '\x89PNG fake')
+        self.write('.hidden', 'secret')
+
+    def tearDown(self):
+        flat.DEPLOY_MANIFEST_PATH = self.manifest_path
+
+        shutil.rmtree(self.tmp)
+        self.mock.stop()
+
+    def write(self, path, contents):
+        with open(os.path.join(self.tmp, path), 'wb') as f:
+            f.write(contents)
+
+    def test_uploads_new_files(self):
+        uploaded = flat.deploy_folder(self.tmp, 'project', workers=4)
+
+        assert sorted(uploaded) == ['project/image.png', 'project/index.html', 'project/js/app.js']
+        assert sorted(k.name for k in self.bucket.list()) == sorted(uploaded)
+
+        key = self.bucket.get_key('project/index.html')
+        body = gzip.GzipFile(fileobj=StringIO(key.get_contents_as_string())).read()
+
+        assert body == '<html>Briefings</html>'
+
+    def test_skips_unchanged_files(self):
+        flat.deploy_folder(self.tmp, 'project', workers=4)
+
+        self.write('js/app.js', 'var briefings = [1];')
+
+        uploaded = flat.deploy_folder(self.tmp, 'project', workers=4)
+
+        assert uploaded == ['project/js/app.js']
+
+    def test_manifest_skips_remote_check(self):
+        flat.deploy_folder(self.tmp, 'project', workers=4)
+
+        # Not noticed, since nothing changed locally
+        self.bucket.delete_key('project/index.html')
+
+        uploaded = flat.deploy_folder(self.tmp, 'project', workers=4)
+
+        assert uploaded == []
+
+        uploaded = flat.deploy_folder(self.tmp, 'project', workers=4, verify=True)
+
+        assert uploaded == ['project/index.html']
+
+    def test_multipart_upload(self):
+        self.write('video.mp4', os.urandom(7 * 1024 * 1024))
+
+        threshold = flat.MULTIPART_THRESHOLD
+        flat.MULTIPART_THRESHOLD = 6 * 1024 * 1024
+        flat.MULTIPART_CHUNK_SIZE, chunk_size = 5 * 1024 * 1024, flat.MULTIPART_CHUNK_SIZE
+
+        try:
+            flat.deploy_folder(self.tmp, 'project', workers=4)
+
+            assert self.bucket.get_key('project/video.mp4').etag.strip('"').endswith('-2')
+
+            uploaded = flat.deploy_folder(self.tmp, 'project', workers=4, verify=True)
+        finally:
+            flat.MULTIPART_THRESHOLD = threshold
+            flat.MULTIPART_CHUNK_SIZE = chunk_size
+
+        assert uploaded == []
+
+    def test_skips_precompressed_siblings(self):
+        manifest_path = precompress.PRECOMPRESS_MANIFEST_PATH
+        precompress.PRECOMPRESS_MANIFEST_PATH = os.path.join(self.tmp, '.precompress_manifest.json')
+
+        try:
+            self.write('data.json.gz', 'compressed asset')
+            precompress.compress_folder(self.tmp)
+
+            uploaded = flat.deploy_folder(self.tmp, 'project', workers=4)
+        finally:
+            precompress.PRECOMPRESS_MANIFEST_PATH = manifest_path
+
+        assert 'project/data.json.gz' in uploaded
+        assert 'project/index.html.gz' not in uploaded
+        assert 'project/index.html' in uploaded
+
+    def test_ignore(self):
+        uploaded = flat.deploy_folder(self.tmp, 'project', ignore=['%s/js/*' % self.tmp])
+
+        assert 'project/js/app.js' not in uploaded
+
+if __name__ == '__main__':
+    unittest.main()
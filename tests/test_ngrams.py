@@ -0,0 +1,73 @@
+#!/usr/bin/env python
+
+import unittest
+
+import ngrams
+
+TOKENS = 'the president said the president will veto the bill'.split(' ')
+
+class CountNgramsTestCase(unittest.TestCase):
+    """
+    Test single-pass n-gram counting.
+    """
+    def test_orders(self):
+        unigrams, bigrams, trigrams = ngrams.count_ngrams(TOKENS, 3)
+
+        assert unigrams['the'] == 3
+        assert unigrams['veto'] == 1
+        assert bigrams['the president'] == 2
+        assert bigrams['the bill'] == 1
+        assert trigrams['the president said'] == 1
+        assert sum(unigrams.values()) == len(TOKENS)
+        assert sum(bigrams.values()) == len(TOKENS) - 1
+        assert sum(trigrams.values()) == len(TOKENS) - 2
+
+    def test_prune_hapaxes(self):
+        unigrams, bigrams, trigrams = ngrams.count_ngrams(TOKENS, 3, min_count=2)
+
+        assert unigrams['veto'] == 1
+        assert bigrams == { 'the president': 2 }
+        assert trigrams == {}
+
+    def test_short_input(self):
+        orders = ngrams.count_ngrams(['ebola'], 3)
+
+        assert orders == [{ 'ebola': 1 }, {}, {}]
+
+    def test_top_counts(self):
+        unigrams, bigrams = ngrams.top_counts(ngrams.count_ngrams(TOKENS, 2), limit=2)
+
+        assert unigrams == [['the', 3], ['president', 2]]
+        assert bigrams == [['the president', 2], ['president said', 1]]
+
+    def test_top_counts_stopwords(self):
+        unigrams, bigrams = ngrams.top_counts(ngrams.count_ngrams(TOKENS, 2), limit=2, stopwords=['the', 'will'])
+
+        assert unigrams == [['president', 2], ['bill', 1]]
+
+        # Only n-grams made up entirely of stopwords are dropped
+        assert bigrams == [['the president', 2], ['president said', 1]]
+
+class EncodingTestCase(unittest.TestCase):
+    """
+    Test the compact count encoding.
+    """
+    def test_round_trip(self):
+        orders = ngrams.count_ngrams(TOKENS, 3)
+
+        assert ngrams.decode(ngrams.encode(orders)) == ngrams.flatten(orders)
+
+    def test_read_counts(self):
+        orders = ngrams.count_ngrams(TOKENS, 2)
+
+        data = ngrams.read_counts({ 'ngrams': ngrams.encode(orders) })
+
+        assert data['words']['the president'] == 2
+        assert 'ngrams' not in data
+
+        legacy = ngrams.read_counts({ 'words': { 'the': 3 } })
+
+        assert legacy['words'] == { 'the': 3 }
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,96 @@
+#!/usr/bin/env python
+
+import gzip
+import os
+import shutil
+import tempfile
+import unittest
+
+import precompress
+
+class CompressFolderTestCase(unittest.TestCase):
+    """
+    Test writing precompressed siblings.
+    """
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.manifest_tmp = tempfile.mkdtemp()
+
+        self.manifest_path = precompress.PRECOMPRESS_MANIFEST_PATH
+        precompress.PRECOMPRESS_MANIFEST_PATH = os.path.join(self.manifest_tmp, '.precompress_manifest.json')
+
+        self.write('app.js', 'var briefings = [];')
+        self.write('image.png', '\x89PNG fake')
+
+    def tearDown(self):
+        precompress.PRECOMPRESS_MANIFEST_PATH = self.manifest_path
+
+        shutil.rmtree(self.tmp)
+        shutil.rmtree(self.manifest_tmp)
+
+    def write(self, name, contents, mtime=1000000000):
+        path = os.path.join(self.tmp, name)
+
+        with open(path, 'wb') as f:
+            f.write(contents)
+
+        os.utime(path, (mtime, mtime))
+
+        return path
+
+    def test_compresses_text_only(self):
+        precompress.compress_folder(self.tmp)
+
+        path = os.path.join(self.tmp, 'app.js')
+
+        assert precompress.variant_path(path, 'gzip') == path + '.gz'
+        assert gzip.open(path + '.gz').read() == 'var briefings = [];'
+        assert not os.path.exists(os.path.join(self.tmp, 'image.png.gz'))
+
+    def test_deterministic(self):
+        path = os.path.join(self.tmp, 'app.js')
+
+        precompress.compress_folder(self.tmp)
+
+        with open(path + '.gz', 'rb') as f:
+            first = f.read()
+
+        os.remove(path + '.gz')
+        precompress.compress_folder(self.tmp)
+
+        with open(path + '.gz', 'rb') as f:
+            assert f.read() == first
+
+    def test_only_rewrites_stale(self):
+        written = precompress.compress_folder(self.tmp)
+
+        assert written == len(precompress.encodings())
+        assert precompress.compress_folder(self.tmp) == 0
+
+        path = self.write('app.js', 'var briefings = [1];', mtime=1000000001)
+
+        assert precompress.variant_path(path, 'gzip') is None
+        assert precompress.compress_folder(self.tmp) == written
+        assert gzip.open(path + '.gz').read() == 'var briefings = [1];'
+
+    def test_removes_orphans(self):
+        precompress.compress_folder(self.tmp)
+
+        os.remove(os.path.join(self.tmp, 'app.js'))
+        precompress.compress_folder(self.tmp)
+
+        assert os.listdir(self.tmp) == ['image.png']
+
+    def test_keeps_compressed_assets(self):
+        # Shipped compressed, with no source beside it
+        path = self.write('data.json.gz', 'not a sibling')
+
+        precompress.compress_folder(self.tmp)
+        precompress.compress_folder(self.tmp)
+
+        assert os.path.exists(path)
+        assert not precompress.is_variant(path)
+        assert precompress.is_variant(os.path.join(self.tmp, 'app.js.gz'))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,65 @@
+#!/usr/bin/env python
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from fabfile import render
+
+class RenderManifestTestCase(unittest.TestCase):
+    """
+    Test tracking which inputs each rendered file was built from.
+    """
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+
+        self.manifest_path = render.RENDER_MANIFEST_PATH
+        render.RENDER_MANIFEST_PATH = os.path.join(self.tmp, '.render_manifest.json')
+
+        self.page = os.path.join(self.tmp, 'index.html')
+
+        with open(self.page, 'w') as f:
+            f.write('<html>Briefings</html>')
+
+        self.inputs = { 'templates': 'abc', 'jst': 'def' }
+
+    def tearDown(self):
+        render.RENDER_MANIFEST_PATH = self.manifest_path
+
+        shutil.rmtree(self.tmp)
+
+    def test_missing_manifest(self):
+        assert render._read_render_manifest() == {}
+
+    def test_round_trip(self):
+        manifest = { self.page: self.inputs, 'step:jst': { 'jst': 'def' } }
+
+        render._write_render_manifest(manifest)
+
+        assert render._read_render_manifest() == manifest
+        assert not os.path.exists('%s.tmp' % render.RENDER_MANIFEST_PATH)
+
+    def test_fresh(self):
+        manifest = { self.page: dict(self.inputs) }
+
+        assert render._is_fresh(manifest, self.page, self.inputs)
+
+    def test_changed_inputs(self):
+        manifest = { self.page: dict(self.inputs) }
+
+        assert not render._is_fresh(manifest, self.page, { 'templates': 'abc', 'jst': 'xyz' })
+        assert not render._is_fresh(manifest, self.page, { 'templates': 'abc' })
+
+    def test_missing_output(self):
+        manifest = { self.page: dict(self.inputs) }
+
+        os.remove(self.page)
+
+        assert not render._is_fresh(manifest, self.page, self.inputs)
+
+    def test_unknown_output(self):
+        assert not render._is_fresh({}, self.page, self.inputs)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,161 @@
+#!/usr/bin/env python
+
+import os
+import shutil
+import tempfile
+import unittest
+
+import app_config
+import render_utils
+
+class AssetManifestTestCase(unittest.TestCase):
+    """
+    Test content-hashed asset names and the manifest that tracks them.
+    """
+    def setUp(self):
+        self.cwd = os.getcwd()
+        self.tmp = tempfile.mkdtemp()
+
+        os.chdir(self.tmp)
+        os.makedirs('www/js')
+
+    def tearDown(self):
+        os.chdir(self.cwd)
+        shutil.rmtree(self.tmp)
+
+    def test_hashed_path(self):
+        path = render_utils.get_hashed_path('js/app.min.js', 'var a = 1;')
+
+        assert path.startswith('js/app.min.')
+        assert path.endswith('.js')
+        assert path == render_utils.get_hashed_path('js/app.min.js', 'var a = 1;')
+        assert path != render_utils.get_hashed_path('js/app.min.js', 'var a = 2;')
+
+    def test_replaces_old_files(self):
+        for path in ['js/app.min.aaa.js', 'js/app.min.bbb.js']:
+            with open('www/%s' % path, 'w') as f:
+                f.write('')
+
+        render_utils.write_asset_manifest({ 'js/app.min.js': 'js/app.min.aaa.js' })
+        manifest = render_utils.write_asset_manifest({ 'js/app.min.js': 'js/app.min.bbb.js' })
+
+        assert manifest == { 'js/app.min.js': 'js/app.min.bbb.js' }
+        assert render_utils.read_asset_manifest() == manifest
+        assert os.listdir('www/js') == ['app.min.bbb.js']
+
+class CachedMinifyTestCase(unittest.TestCase):
+    """
+    Test the on-disk minification cache.
+    """
+    def setUp(self):
+        self.cache_dir = render_utils.MINIFY_CACHE_DIR
+        self.tmp = tempfile.mkdtemp()
+        self.calls = []
+
+        render_utils.MINIFY_CACHE_DIR = self.tmp
+
+    def tearDown(self):
+        render_utils.MINIFY_CACHE_DIR = self.cache_dir
+        shutil.rmtree(self.tmp)
+
+    def minifier(self, text):
+        self.calls.append(text)
+
+        return text.replace(' ', '')
+
+    def test_minifies_once(self):
+        first = render_utils.cached_minify(self.minifier, 'slimit', 'js/app.js', u'var a = 1;')
+        second = render_utils.cached_minify(self.minifier, 'slimit', 'js/app.js', u'var a = 1;')
+
+        assert first == second == u'vara=1;'
+        assert len(self.calls) == 1
+
+    def test_changed_text(self):
+        render_utils.cached_minify(self.minifier, 'slimit', 'js/app.js', u'var a = 1;')
+        render_utils.cached_minify(self.minifier, 'slimit', 'js/app.js', u'var a = 2;')
+
+        assert len(self.calls) == 2
+
+class GetCopyTestCase(unittest.TestCase):
+    """
+    Test that the copy spreadsheet is only reparsed when it changes.
+    """
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmp, 'copy.xlsx')
+        self.copy = render_utils.copytext.Copy
+        self.parsed = []
+
+        def parse(path):
+            self.parsed.append(path)
+
+            return object()
+
+        render_utils.copytext.Copy = parse
+        render_utils._copy_cache.clear()
+
+        self.touch(1000000000)
+
+    def tearDown(self):
+        render_utils.copytext.Copy = self.copy
+        render_utils._copy_cache.clear()
+
+        shutil.rmtree(self.tmp)
+
+    def touch(self, mtime):
+        with open(self.path, 'w') as f:
+            f.write('')
+
+        os.utime(self.path, (mtime, mtime))
+
+    def test_parses_once(self):
+        first = render_utils.get_copy(self.path)
+
+        assert render_utils.get_copy(self.path) is first
+        assert self.parsed == [self.path]
+
+    def test_reparses_after_change(self):
+        first = render_utils.get_copy(self.path)
+
+        self.touch(1000000001)
+
+        assert render_utils.get_copy(self.path) is not first
+        assert self.parsed == [self.path, self.path]
+
+class FlattenAppConfigTestCase(unittest.TestCase):
+    """
+    Test the cached app_config snapshot.
+    """
+    def setUp(self):
+        self.target = app_config.DEPLOYMENT_TARGET
+
+    def tearDown(self):
+        app_config.configure_targets(self.target)
+
+    def test_cached_per_target(self):
+        app_config.configure_targets('staging')
+
+        config = render_utils.flatten_app_config()
+
+        assert config['DEPLOYMENT_TARGET'] == 'staging'
+        assert config == render_utils.flatten_app_config()
+
+        # The snapshot is a copy
+        config['DEPLOYMENT_TARGET'] = 'nowhere'
+
+        assert render_utils.flatten_app_config()['DEPLOYMENT_TARGET'] == 'staging'
+
+    def test_rebuilt_after_configure_targets(self):
+        app_config.configure_targets('staging')
+        staging = render_utils.flatten_app_config()
+
+        app_config.configure_targets('production')
+        production = render_utils.flatten_app_config()
+
+        assert production['DEPLOYMENT_TARGET'] == 'production'
+        assert production['S3_BUCKET'] == app_config.PRODUCTION_S3_BUCKET
+        assert staging['S3_BUCKET'] == app_config.STAGING_S3_BUCKET
+        assert production['DEBUG'] is False
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,98 @@
+#!/usr/bin/env python
+
+import unittest
+
+import ngrams
+import speakers
+
+TRANSCRIPT = u"""
+James S. Brady Press Briefing Room
+12:42 P.M. EST
+MR. EARNEST: Good afternoon, everybody.
+Q Thanks, Josh. What about Ebola?
+MR. EARNEST: The Ebola response continues.
+It is going well.
+SECRETARY JOHNSON: Thank you, Josh.
+Q: Ebola?
+END 1:51 P.M. EST"""
+
+def tokenize(text):
+    return text.replace(',', '').replace('.', '').replace('?', '').split()
+
+class IterTurnsTestCase(unittest.TestCase):
+    """
+    Test splitting transcripts into speaker turns.
+    """
+    def test_turns(self):
+        turns = list(speakers.iter_turns(TRANSCRIPT))
+
+        assert [(name, role) for name, role, text in turns] == [
+            (None, None),
+            ('MR. EARNEST', speakers.SECRETARY),
+            ('Q', speakers.REPORTERS),
+            ('MR. EARNEST', speakers.SECRETARY),
+            ('SECRETARY JOHNSON', speakers.GUESTS),
+            ('Q', speakers.REPORTERS)
+        ]
+
+        assert turns[1][2] == 'Good afternoon, everybody.'
+        assert turns[3][2] == 'The Ebola response continues.\nIt is going well.'
+        assert turns[5][2] == 'Ebola?\nEND 1:51 P.M. EST'
+
+    def test_ordinary_lines_are_not_markers(self):
+        assert speakers._match_speaker('Questions remain about ISIL.') is None
+        assert speakers._match_speaker('12:42 P.M. EST') is None
+        assert speakers._match_speaker('I said: no.') is None
+
+    def test_single_words_are_not_markers(self):
+        assert speakers._match_speaker(u'OK: fine') is None
+        assert speakers._match_speaker(u'I: think so.') is None
+        assert speakers._match_speaker(u'NO: not at all.') is None
+
+    def test_titled_markers(self):
+        assert speakers._match_speaker('ADMIRAL KIRBY: Thanks.') == ('ADMIRAL KIRBY', speakers.GUESTS, 'Thanks.')
+        assert speakers._match_speaker('THE PRESS SECRETARY: Hi.') == ('THE PRESS SECRETARY', speakers.SECRETARY, 'Hi.')
+
+    def test_non_breaking_spaces(self):
+        assert speakers._match_speaker(u'Q\xa0\xa0 Thanks, Josh.') == ('Q', speakers.REPORTERS, u'Thanks, Josh.')
+        assert speakers._match_speaker(u'MR.\xa0EARNEST:\xa0 Thanks.') == ('MR. EARNEST', speakers.SECRETARY, u'Thanks.')
+
+class CountSpeakersTestCase(unittest.TestCase):
+    """
+    Test per-speaker counting.
+    """
+    def setUp(self):
+        self.output = ngrams.read_counts(speakers.count_speakers(TRANSCRIPT, tokenize))
+
+    def test_role_counts(self):
+        assert self.output['secretary']['words']['ebola'] == 1
+        assert self.output['reporters']['words']['ebola'] == 2
+        assert self.output['words']['ebola'] == 3
+        assert 'earnest' not in self.output['words']
+
+    def test_ngrams_stay_within_turns(self):
+        # "everybody thanks" spans a change of speaker
+        assert self.output['words']['everybody thanks'] == 1
+        assert 'everybody thanks' not in self.output['secretary']['words']
+        assert 'everybody thanks' not in self.output['reporters']['words']
+
+    def test_turn_offsets(self):
+        turns = self.output['turns']
+        table = self.output['speakers']
+
+        assert len(turns) == 12
+        assert table[turns[3]] == ['MR. EARNEST', speakers.SECRETARY]
+        assert turns[2] == 9
+        assert self.output['count'] == sum(self.output[role]['count'] for role in speakers.ROLES) + 9
+
+    def test_top(self):
+        assert 'top' not in self.output
+
+        output = speakers.count_speakers(TRANSCRIPT, tokenize, top_n=5)
+
+        assert len(output['top']) == 3
+        assert len(output['top'][0]) == 5
+        assert ['ebola', 3] in output['top'][0]
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,100 @@
+#!/usr/bin/env python
+
+import os
+import shutil
+import tempfile
+import unittest
+
+import app
+import static
+
+class CompileCacheTestCase(unittest.TestCase):
+    """
+    Test reusing compiler output until its sources change.
+    """
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmp, 'app.less')
+        self.command = ['cat', self.path]
+
+        self.write('body { color: red; }', 1000000000)
+
+    def tearDown(self):
+        static._compiled.clear()
+        shutil.rmtree(self.tmp)
+
+    def write(self, contents, mtime):
+        with open(self.path, 'w') as f:
+            f.write(contents)
+
+        os.utime(self.path, (mtime, mtime))
+
+    def test_reuses_output(self):
+        output, etag = static._compile(self.command, self.tmp)
+
+        # Same mtime, so the stale output is kept
+        self.write('body { color: blue; }', 1000000000)
+
+        assert static._compile(self.command, self.tmp) == (output, etag)
+
+    def test_recompiles_changed_sources(self):
+        output, etag = static._compile(self.command, self.tmp)
+
+        self.write('body { color: blue; }', 1000000001)
+
+        new_output, new_etag = static._compile(self.command, self.tmp)
+
+        assert new_output == 'body { color: blue; }'
+        assert new_etag != etag
+
+class StaticFileTestCase(unittest.TestCase):
+    """
+    Test conditional and range requests for static files.
+    """
+    def setUp(self):
+        app.app.config['TESTING'] = True
+        self.client = app.app.test_client()
+
+        with open('www/js/app.js', 'rb') as f:
+            self.contents = f.read()
+
+    def test_full_file(self):
+        response = self.client.get('/js/app.js')
+
+        assert response.status_code == 200
+        assert response.data == self.contents
+        assert response.headers['Content-Length'] == str(len(self.contents))
+        assert response.headers['ETag']
+        assert response.headers['Last-Modified']
+
+    def test_not_modified(self):
+        etag = self.client.get('/js/app.js').headers['ETag']
+
+        response = self.client.get('/js/app.js', headers={ 'If-None-Match': etag })
+
+        assert response.status_code == 304
+        assert response.data == ''
+
+    def test_range(self):
+        response = self.client.get('/js/app.js', headers={ 'Range': 'bytes=10-19' })
+
+        assert response.status_code == 206
+        assert response.data == self.contents[10:20]
+        assert response.headers['Content-Range'] == 'bytes 10-19/%i' % len(self.contents)
+
+    def test_suffix_range(self):
+        response = self.client.get('/js/app.js', headers={ 'Range': 'bytes=-5' })
+
+        assert response.status_code == 206
+        assert response.data == self.contents[-5:]
+
+    def test_unsatisfiable_range(self):
+        response = self.client.get('/js/app.js', headers={ 'Range': 'bytes=%i-' % (len(self.contents) + 10) })
+
+        assert response.status_code == 416
+
+    def test_missing_file(self):
+        assert self.client.get('/js/missing.js').status_code == 404
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,74 @@
+#!/usr/bin/env python
+
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+import term_matrix
+
+class TermMatrixTestCase(unittest.TestCase):
+    """
+    Test building and slicing the term matrices.
+    """
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.matrix_dir = os.path.join(self.tmp, 'matrix')
+
+        # 12-08-14 is a Monday, 12-13-14 a Saturday in the same week,
+        # 12-22-14 two weeks later
+        briefings = {
+            '12-08-14': { 'ebola': 3, 'isis': 1, 'health care': 2, 'health': 2, 'care': 2 },
+            '12-13-14': { 'ebola': 1, 'isil': 4 },
+            '12-22-14': { 'isis': 2 }
+        }
+
+        paths = []
+
+        for date, words in briefings.items():
+            path = os.path.join(self.tmp, '%s.json' % date)
+
+            with open(path, 'w') as f:
+                json.dump({ 'words': words }, f)
+
+            paths.append(path)
+
+        term_matrix.build_matrix(paths, ['health care', 'islamic state'], self.matrix_dir)
+
+        self.matrix = term_matrix.TermMatrix(self.matrix_dir)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp)
+
+    def test_weeks_are_contiguous(self):
+        assert self.matrix.weeks == ['2014-12-07', '2014-12-14', '2014-12-21']
+        assert self.matrix.briefings == ['12-08-14', '12-13-14', '12-22-14']
+
+    def test_week_counts(self):
+        weeks, counts = self.matrix.week_counts(['ebola'])
+
+        assert list(counts) == [4, 0, 0]
+
+        weeks, counts = self.matrix.week_counts(['health care'])
+
+        assert list(counts) == [2, 0, 0]
+
+    def test_synonyms_sum_rows(self):
+        weeks, counts = self.matrix.week_counts(['isis', 'isil', 'islamic state', 'unknown'])
+
+        assert list(counts) == [5, 0, 2]
+
+    def test_week_slice(self):
+        weeks, counts = self.matrix.week_counts(['isis'], '2014-12-14', '2015-01-01')
+
+        assert weeks == ['2014-12-14', '2014-12-21']
+        assert list(counts) == [0, 2]
+
+    def test_briefing_counts(self):
+        briefings, counts = self.matrix.briefing_counts(['ebola'])
+
+        assert list(counts) == [3, 1, 0]
+
+if __name__ == '__main__':
+    unittest.main()